@@ -39,6 +39,8 @@ Output:
 30.00
 ```""",
                 "constraints": "1 ≤ n ≤ 100, -1000 ≤ each integer ≤ 1000",
+                "checker": "float",  # accept any formatting of the average within rounding of 2 decimals
+                "checker_abs_eps": 0.005,
                 "visible_tests": [
                     {"input": "5\n10 20 30 40 50", "output": "150\n30.00"},
                     {"input": "3\n1 2 3", "output": "6\n2.00"},
@@ -445,7 +447,9 @@ Output:
                 title=prob_data["title"],
                 description=prob_data["description"],
                 difficulty=prob_data["difficulty"],
-                constraints=prob_data["constraints"]
+                constraints=prob_data["constraints"],
+                checker=prob_data.get("checker", "exact"),
+                checker_abs_eps=prob_data.get("checker_abs_eps")
             )
             db.add(problem)
             db.flush()  # Get the problem ID
@@ -0,0 +1,255 @@
+"""
+Online backups and per-term archives of old submissions.
+
+backup_database copies the live database with SQLite's backup API, a few
+hundred pages per step. The source connection holds one read transaction for
+the whole copy, so the backup is a consistent snapshot. In WAL mode an open
+reader does not block writers, and no commit restarts the copy. It is written
+to a temporary file and renamed into place, so a backup path never holds a
+partial copy.
+
+archive_submissions moves submissions created before a cutoff into
+ARCHIVE_DIR/<term>.db. That file has the full schema, so it stays queryable
+with the same models, read-only (see open_archive). Each chunk's submissions
+are copied along with the rows they need: users (without password hashes),
+problems, the test cases of their results, code blobs and per-test results.
+File-backed test data of those test cases is copied to ARCHIVE_DIR/<term>-test-data
+(see archive_data_store), so archived results stay readable after the hot tests
+and their files are gone. Rows already in the archive are kept; a user or
+problem whose name an archived row with another id already has gets its id
+appended. That copy commits first, then the hot rows are deleted (their test results
+cascade) and the gradebook rows of their users and problems are recomputed.
+Every chunk is its own short transaction, and an interrupted run can simply
+be repeated. Keeping old terms out of the hot database keeps its tables and
+indexes small enough to stay in the page cache.
+
+Usage:
+    python archive.py backup <backup.db>
+    python archive.py archive <term> <YYYY-MM-DD>   # submissions created before the date
+"""
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import models  # registers the tables on Base.metadata
+from database import Base, SQLITE_BUSY_TIMEOUT_MS, SQLITE_FILE, configure_sqlite
+from gradebook import DELETE_PAIR_SQL, REFRESH_PAIR_SQL
+from testdata_store import TestDataStore, test_data_store
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))  # submissions per transaction
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))  # seconds between steps
+
+TERM_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,50}$")
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
+
+def backup_database(target: str, source: Optional[str] = None, progress: Optional[Callable[[int, int], None]] = None):
+    """Consistent copy of the database at target, taken while the server keeps writing"""
+    source = source or SQLITE_FILE
+    partial = f"{target}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    src = _connect(source)
+    dst = sqlite3.connect(partial)
+    try:
+        # Pin one snapshot for the whole copy: commits made meanwhile go to the
+        # WAL without touching it, instead of restarting the backup
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(
+            dst, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP,
+            progress=(lambda status, remaining, total: progress(total - remaining, total)) if progress else None
+        )
+        src.rollback()
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+
+# ==================== Archives ====================
+
+def archive_path(term: str) -> str:
+    if not TERM_PATTERN.match(term):
+        raise ValueError("Term names may only contain letters, digits, '-' and '_'")
+    return os.path.join(ARCHIVE_DIR, f"{term}.db")
+
+def archive_data_store(term: str) -> TestDataStore:
+    """File-backed test data of a term's archived test cases"""
+    archive_path(term)
+    return TestDataStore(root=os.path.join(ARCHIVE_DIR, f"{term}-test-data"))
+
+def list_archives() -> List[str]:
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(name[:-3] for name in os.listdir(ARCHIVE_DIR) if name.endswith(".db") and TERM_PATTERN.match(name[:-3]))
+
+def _columns(table: str) -> List[str]:
+    return [column.name for column in Base.metadata.tables[table].columns]
+
+def _unique(table: str, column: str) -> str:
+    """Select expression for a unique column - a value an archived row with another id holds gets the id appended"""
+    return (
+        f"CASE WHEN EXISTS (SELECT 1 FROM archive.{table} AS archived "
+        f"WHERE archived.{column} = main.{table}.{column} AND archived.id != main.{table}.id) "
+        f"THEN {column} || ' (#' || id || ')' ELSE {column} END"
+    )
+
+def _copy(conn: sqlite3.Connection, table: str, where: str, ids: List[int], replace: Optional[Dict[str, str]] = None):
+    """
+    Copy the rows of main.<table> matching where (with ? bound to each id) into
+    archive.<table>. Rows already archived (same primary key) are skipped; any other
+    conflict raises rather than silently dropping a row.
+    """
+    columns = _columns(table)
+    key = ", ".join(column.name for column in Base.metadata.tables[table].primary_key)
+    select = ", ".join((replace or {}).get(column, column) for column in columns)
+    placeholders = ", ".join("?" for _ in ids)
+    conn.execute(
+        f"INSERT INTO archive.{table} ({', '.join(columns)}) "
+        f"SELECT {select} FROM main.{table} WHERE {where.format(ids=placeholders)} "
+        f"ON CONFLICT ({key}) DO NOTHING",
+        ids * where.count("{ids}")
+    )
+
+def _copy_test_data(conn: sqlite3.Connection, store: TestDataStore, ids: List[int]):
+    """Copy the files of the chunk's file-backed test cases into the archive's test data store"""
+    placeholders = ", ".join("?" for _ in ids)
+    rows = conn.execute(
+        f"SELECT input_ref, expected_ref FROM main.test_cases WHERE id IN "
+        f"(SELECT test_case_id FROM main.test_results WHERE submission_id IN ({placeholders}))", ids
+    ).fetchall()
+    for ref in {ref for row in rows for ref in row if ref}:
+        target = store.path(ref)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(test_data_store.path(ref), f"{target}.partial")
+        os.replace(f"{target}.partial", target)
+
+def archive_submissions(term: str, before: datetime, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> int:
+    """Move submissions created before the cutoff into the term's archive; returns how many moved"""
+    path = archive_path(term)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archive_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=archive_engine)
+    archive_engine.dispose()
+
+    store = archive_data_store(term)
+    cutoff = before.strftime("%Y-%m-%d %H:%M:%S")
+    conn = _connect(SQLITE_FILE)
+    moved = 0
+    try:
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        while True:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM main.submissions WHERE created_at < ? ORDER BY id LIMIT ?", (cutoff, chunk_size)
+            )]
+            if not ids:
+                break
+            placeholders = ", ".join("?" for _ in ids)
+            # Rows already archived are skipped by id - ids the hot database reused must not be mistaken for them
+            reused = conn.execute(
+                f"SELECT COUNT(*) FROM main.submissions AS hot JOIN archive.submissions AS archived ON archived.id = hot.id "
+                f"WHERE hot.id IN ({placeholders}) AND (archived.user_id, archived.created_at) IS NOT (hot.user_id, hot.created_at)",
+                ids
+            ).fetchone()[0]
+            if reused:
+                raise ValueError(f"Archive {term} holds other submissions with the ids of {reused} submissions - use a new term")
+            # Parents first, so the archive's foreign keys hold. Commits across
+            # attached WAL databases are not atomic - hence copy, commit, then delete.
+            _copy(conn, "users", "id IN (SELECT user_id FROM main.submissions WHERE id IN ({ids}))", ids,
+                  replace={"password_hash": "''", "username": _unique("users", "username")})
+            _copy(conn, "problems", "id IN (SELECT problem_id FROM main.submissions WHERE id IN ({ids}))", ids,
+                  replace={"title": _unique("problems", "title")})
+            _copy(conn, "test_cases", "id IN (SELECT test_case_id FROM main.test_results WHERE submission_id IN ({ids}))", ids)
+            _copy_test_data(conn, store, ids)
+            _copy(conn, "code_blobs", "hash IN (SELECT code_hash FROM main.submissions WHERE id IN ({ids})) "
+                                      "OR hash IN (SELECT files_hash FROM main.submissions WHERE id IN ({ids}))", ids)
+            _copy(conn, "submissions", "id IN ({ids})", ids)
+            _copy(conn, "test_results", "submission_id IN ({ids})", ids)
+            conn.commit()
+
+            pairs = conn.execute(
+                f"SELECT DISTINCT user_id, problem_id FROM main.submissions WHERE id IN ({placeholders})", ids
+            ).fetchall()
+            conn.execute(f"DELETE FROM main.submissions WHERE id IN ({placeholders})", ids)
+            # The gradebook covers the submissions still in the hot database
+            # (unqualified table names resolve to main before attached databases)
+            for user_id, problem_id in pairs:
+                params = {"user_id": user_id, "problem_id": problem_id}
+                conn.execute(DELETE_PAIR_SQL, params)
+                conn.execute(REFRESH_PAIR_SQL, params)
+            conn.commit()
+            moved += len(ids)
+            logger.info(f"Archive {term}: {moved} submissions moved")
+    finally:
+        conn.close()
+    return moved
+
+_archive_engines: Dict[str, Engine] = {}
+_archive_lock = threading.Lock()
+
+def open_archive(term: str) -> Session:
+    """Read-only session on a term's archive; raises FileNotFoundError for unknown terms"""
+    path = os.path.abspath(archive_path(term))
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    with _archive_lock:
+        if term not in _archive_engines:
+            _archive_engines[term] = create_engine(
+                f"sqlite:///file:{path}?mode=ro&uri=true", connect_args={"check_same_thread": False}
+            )
+            configure_sqlite(_archive_engines[term], read_only=True)
+        return sessionmaker(autocommit=False, autoflush=False, bind=_archive_engines[term])()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="  ... %(message)s")
+    args = sys.argv[1:]
+    if not SQLITE_FILE:
+        print("❌ Backups and archives need a file-backed SQLite DATABASE_URL")
+        sys.exit(1)
+
+    if len(args) == 2 and args[0] == "backup":
+        print(f"Backing up {SQLITE_FILE} to {args[1]}...")
+        backup_database(args[1])
+        print(f"✓ Backup written to {args[1]}")
+    elif len(args) == 3 and args[0] == "archive":
+        from blob_store import collect_garbage
+        from database import SessionLocal
+
+        try:
+            term, before = args[1], datetime.strptime(args[2], "%Y-%m-%d")
+            archive_path(term)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"Archiving submissions created before {args[2]} into {archive_path(term)}...")
+        moved = archive_submissions(term, before)
+        db = SessionLocal()
+        try:
+            orphaned = collect_garbage(db)
+        finally:
+            db.close()
+        print(f"✓ Archived {moved} submissions, deleted {orphaned} code blobs no longer referenced")
+    else:
+        print("Usage: python archive.py backup <backup.db> | archive <term> <YYYY-MM-DD>")
+        sys.exit(1)
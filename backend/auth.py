@@ -1,16 +1,18 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
 import models
 import schemas
-from database import get_db
+from cache import TTLCache
+from database import SessionLocal, get_read_db, run_db
+from passwords import get_password_hash, get_password_hash_async, needs_rehash, verify_password, verify_password_async
 
 load_dotenv()
 
@@ -24,17 +26,11 @@ if not SECRET_KEY or SECRET_KEY == "your-secret-key-here":
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))  # users
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds; bounds staleness across worker processes
 
 security = HTTPBearer()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -45,18 +41,56 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(models.User).filter(models.User.username == username).first()
+def _save_password_hash(user_id: int, password_hash: str):
+    db = SessionLocal()
+    try:
+        db.query(models.User).filter(models.User.id == user_id).update({"password_hash": password_hash})
+        db.commit()
+    finally:
+        db.close()
+
+async def authenticate_user(db: Session, username: str, password: str):
+    """db may be a read-only session - a rehash is written through its own writer session"""
+    user = await run_db(lambda: db.query(models.User).filter(models.User.username == username).first())
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return False
+    if needs_rehash(user.password_hash):
+        # BCRYPT_ROUNDS changed since this hash was made - upgrade it while we know the password
+        await run_db(_save_password_hash, user.id, await get_password_hash_async(password))
     return user
 
+class CurrentUser(NamedTuple):
+    """Identity of the authenticated user - a plain value, safe to share between requests"""
+    id: int
+    username: str
+    role: str
+    created_at: datetime
+
+# Token subject (username) -> CurrentUser. Every authenticated request resolves its
+# user, so a warm entry skips the users query entirely. In-process changes evict
+# entries through the listeners below; the TTL covers changes made elsewhere.
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def invalidate_user(username: str):
+    user_cache.pop(username)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _evict_changed_user(mapper, connection, target):
+    # Covers ORM flushes; bulk UPDATE/DELETE statements must call invalidate_user themselves
+    history = inspect(target).attrs.username.history
+    usernames = {*history.deleted, *history.unchanged, *history.added}  # old and new name on renames
+    if not usernames:
+        user_cache.clear()  # username was never loaded on this instance - evict everyone
+    for username in usernames:
+        invalidate_user(username)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
+    db: Session = Depends(get_read_db)
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -72,12 +106,20 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
+    user = user_cache.get(token_data.username)
+    if user is not None:
+        return user
+
+    db_user = await run_db(
+        lambda: db.query(models.User).filter(models.User.username == token_data.username).first()
+    )
+    if db_user is None:
         raise credentials_exception
+    user = CurrentUser(db_user.id, db_user.username, db_user.role, db_user.created_at)
+    user_cache.set(user.username, user)
     return user
 
-async def get_current_admin(current_user: models.User = Depends(get_current_user)):
+async def get_current_admin(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
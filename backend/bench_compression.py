@@ -0,0 +1,110 @@
+"""
+Benchmark for compressed text columns: DB size, write latency and read latency
+of plain TEXT versus CompressedText on a realistic dataset.
+
+Dataset: PROBLEMS problems with 13 hidden tests each. Most tests are small
+(a few numbers), every problem has LARGE_TESTS tests of ~LARGE_TEST_KB KB of
+numbers, like our big-input hidden tests.
+
+Usage: python bench_compression.py
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, Text, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from db_types import COMPRESS_THRESHOLD, CompressedText
+
+PROBLEMS = 40
+TESTS_PER_PROBLEM = 13
+LARGE_TESTS = 2
+LARGE_TEST_KB = 300
+READ_ROUNDS = 5
+
+def make_dataset(seed: int = 124):
+    rng = random.Random(seed)
+    rows = []
+    for problem_id in range(1, PROBLEMS + 1):
+        for i in range(TESTS_PER_PROBLEM):
+            if i < LARGE_TESTS:
+                numbers = []
+                size = 0
+                while size < LARGE_TEST_KB * 1024:
+                    number = str(rng.randint(-100000, 100000))
+                    numbers.append(number)
+                    size += len(number) + 1
+                data = f"{len(numbers)}\n" + " ".join(numbers)
+                expected = "\n".join(str(int(n) * 2) for n in numbers[:2000])
+            else:
+                a, b = rng.randint(-1000, 1000), rng.randint(-1000, 1000)
+                data, expected = f"{a} {b}", str(a + b)
+            rows.append({"problem_id": problem_id, "input": data, "expected_output": expected})
+    return rows
+
+def run(column_type, rows):
+    Base = declarative_base()
+
+    class BenchTestCase(Base):
+        __tablename__ = "test_cases"
+        id = Column(Integer, primary_key=True)
+        problem_id = Column(Integer, index=True)
+        input = Column(column_type, nullable=False)
+        expected_output = Column(column_type, nullable=False)
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    # Write: one problem's tests per transaction, like the admin endpoints
+    write_times = []
+    for problem_id in range(1, PROBLEMS + 1):
+        db = Session()
+        start = time.perf_counter()
+        db.add_all([BenchTestCase(**r) for r in rows if r["problem_id"] == problem_id])
+        db.commit()
+        write_times.append(time.perf_counter() - start)
+        db.close()
+
+    # Read: load every problem's tests, as grading does
+    read_times = []
+    for _ in range(READ_ROUNDS):
+        for problem_id in range(1, PROBLEMS + 1):
+            db = Session()
+            start = time.perf_counter()
+            tests = db.query(BenchTestCase).filter(BenchTestCase.problem_id == problem_id).all()
+            sum(len(t.input) + len(t.expected_output) for t in tests)
+            read_times.append(time.perf_counter() - start)
+            db.close()
+
+    engine.dispose()
+    size = os.path.getsize(path)
+    return size, statistics.median(write_times), statistics.median(read_times)
+
+def main():
+    rows = make_dataset()
+    raw_bytes = sum(len(r["input"]) + len(r["expected_output"]) for r in rows)
+    print("=" * 60)
+    print("Compressed column benchmark")
+    print(f"{len(rows)} test cases, {raw_bytes / 1024 / 1024:.1f} MB of test data, threshold {COMPRESS_THRESHOLD} B")
+    print("=" * 60)
+
+    results = {}
+    for name, column_type in [("Text", Text), ("CompressedText", CompressedText)]:
+        results[name] = run(column_type, rows)
+        size, write, read = results[name]
+        print(f"{name:16} size {size / 1024 / 1024:7.2f} MB | write/problem {write * 1000:7.2f} ms | read/problem {read * 1000:7.2f} ms")
+
+    plain, compressed = results["Text"], results["CompressedText"]
+    print("-" * 60)
+    print(f"DB size:  {plain[0] / compressed[0]:.1f}x smaller")
+    print(f"Write:    {compressed[1] / plain[1]:.2f}x the plain latency")
+    print(f"Read:     {compressed[2] / plain[2]:.2f}x the plain latency")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark for the SQLite storage profile: read and write concurrency during a
+simulated exam, with the default engine versus the production profile from
+database.py (WAL, tuned pragmas, read-only pool plus one serialized writer).
+
+The tuned profile is also run with synchronous=NORMAL to show what the FULL
+default costs (NORMAL may lose the last commits on power loss).
+
+Simulation: WRITERS threads store graded submissions (a submission row plus
+TESTS_PER_SUBMISSION test_results rows, one commit each) while READERS threads
+page through submission history and load submission details, for DURATION
+seconds per profile, on a database pre-filled with SEED_SUBMISSIONS submissions.
+
+Usage: python bench_sqlite.py
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # keep the app's own engines off disk while importing models
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base, configure_sqlite
+
+WRITERS = 8
+READERS = 16
+DURATION = 10  # seconds per profile
+SEED_SUBMISSIONS = 5000
+TESTS_PER_SUBMISSION = 12
+USERS = 300
+PROBLEMS = 20
+
+def setup(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([models.User(id=i, username=f"user{i}", password_hash="x", role="student") for i in range(1, USERS + 1)])
+    db.add_all([models.Problem(id=i, title=f"Problem {i}", description="...", difficulty="Easy") for i in range(1, PROBLEMS + 1)])
+    db.add(models.CodeBlob(hash="0" * 64, data=b"", size=0))
+    db.commit()
+    rng = random.Random(124)
+    for _ in range(SEED_SUBMISSIONS):
+        store_submission(db, rng)
+    db.close()
+    engine.dispose()
+
+def store_submission(db, rng: random.Random):
+    submission = models.Submission(
+        user_id=rng.randint(1, USERS),
+        problem_id=rng.randint(1, PROBLEMS),
+        code_hash="0" * 64,
+        score=rng.random() * 100,
+        status="completed"
+    )
+    db.add(submission)
+    db.flush()
+    db.bulk_insert_mappings(models.TestResult, [
+        {"submission_id": submission.id, "position": i, "passed": rng.random() < 0.8, "status": "Accepted"}
+        for i in range(TESTS_PER_SUBMISSION)
+    ])
+    db.commit()
+
+def read_page(db, rng: random.Random):
+    """A student's submission history page, then one submission's per-test results"""
+    rows = db.query(models.Submission.id, models.Submission.score, models.Submission.created_at).filter(
+        models.Submission.user_id == rng.randint(1, USERS),
+        models.Submission.problem_id == rng.randint(1, PROBLEMS)
+    ).order_by(models.Submission.created_at.desc()).limit(20).all()
+    submission_id = rows[0].id if rows else rng.randint(1, SEED_SUBMISSIONS)
+    db.query(models.TestResult).filter(models.TestResult.submission_id == submission_id).all()
+    db.rollback()
+
+def worker(Session, action, stop: threading.Event, latencies: list, errors: list, seed: int):
+    rng = random.Random(seed)
+    db = Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            action(db, rng)
+            latencies.append(time.perf_counter() - start)
+        except OperationalError as e:  # "database is locked"
+            db.rollback()
+            errors.append(str(e.orig))
+    db.close()
+
+def run(name: str, path: str, tuned: bool, synchronous: str = "FULL"):
+    if tuned:
+        write_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+        configure_sqlite(write_engine, synchronous=synchronous)
+        read_engine = create_engine(
+            f"sqlite:///file:{path}?mode=ro&uri=true",
+            connect_args={"check_same_thread": False}, pool_size=READERS, max_overflow=0
+        )
+        configure_sqlite(read_engine, read_only=True, synchronous=synchronous)
+    else:
+        write_engine = read_engine = create_engine(
+            f"sqlite:///{path}", connect_args={"check_same_thread": False},
+            pool_size=WRITERS + READERS, max_overflow=0
+        )
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+    with write_engine.connect():  # the writer switches the file to WAL before readers open it
+        pass
+
+    stop = threading.Event()
+    read_latencies, write_latencies, read_errors, write_errors = [], [], [], []
+    threads = [
+        threading.Thread(target=worker, args=(WriteSession, store_submission, stop, write_latencies, write_errors, i))
+        for i in range(WRITERS)
+    ] + [
+        threading.Thread(target=worker, args=(ReadSession, read_page, stop, read_latencies, read_errors, 1000 + i))
+        for i in range(READERS)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    write_engine.dispose()
+    read_engine.dispose()
+
+    def p95(values):
+        return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) >= 20 else float("nan")
+
+    print(
+        f"{name:8} writes {len(write_latencies) / DURATION:8.1f}/s (p95 {p95(write_latencies):7.1f} ms, {len(write_errors)} locked) | "
+        f"reads {len(read_latencies) / DURATION:8.1f}/s (p95 {p95(read_latencies):7.1f} ms, {len(read_errors)} locked)"
+    )
+    return len(write_latencies), len(read_latencies)
+
+def main():
+    print("=" * 60)
+    print("SQLite storage profile benchmark")
+    print(f"{WRITERS} writers, {READERS} readers, {DURATION}s per profile, {SEED_SUBMISSIONS} seeded submissions")
+    print("=" * 60)
+
+    results = {}
+    for name, tuned, synchronous in [("default", False, "FULL"), ("tuned", True, "FULL"), ("normal", True, "NORMAL")]:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        setup(path)
+        results[name] = run(name, path, tuned, synchronous)
+
+    default_writes, default_reads = results["default"]
+    print("-" * 60)
+    for name in ("tuned", "normal"):
+        writes, reads = results[name]
+        print(f"{name:8} {writes / max(default_writes, 1):.1f}x the default write throughput, {reads / max(default_reads, 1):.1f}x the read throughput")
+
+if __name__ == "__main__":
+    main()
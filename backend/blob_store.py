@@ -0,0 +1,83 @@
+"""
+Content-addressed store for submitted source code.
+Source text and additional files are zlib-compressed into code_blobs, keyed by
+the SHA-256 of their content; submissions reference blobs by hash, so identical
+resubmissions share one row and identical code is an index lookup.
+
+Usage: python blob_store.py gc   # delete blobs no submission references
+"""
+import hashlib
+import json
+import sys
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import models
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode(), 6)
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode()
+
+def put_blob(db: Session, text: str) -> str:
+    """
+    Store text if it is not stored yet and return its hash (caller commits).
+    The INSERT takes the SQLite write lock until that commit - call it in the
+    transaction that stores the submission, after grading, never before slow work.
+    """
+    digest = blob_hash(text)
+    values = {"hash": digest, "data": compress_text(text), "size": len(text)}
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(sqlite_insert(models.CodeBlob).values(**values).on_conflict_do_nothing())
+    elif db.get(models.CodeBlob, digest) is None:
+        db.add(models.CodeBlob(**values))
+        db.flush()
+    return digest
+
+def put_files(db: Session, additional_files: Optional[List[Dict[str, str]]]) -> Optional[str]:
+    """Store a submission's additional files as one blob, or None if there are none"""
+    if not additional_files:
+        return None
+    return put_blob(db, json.dumps(additional_files, sort_keys=True))
+
+def load_texts(db: Session, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+    """Decompressed text of several blobs in one query"""
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return {}
+    blobs = db.query(models.CodeBlob).filter(models.CodeBlob.hash.in_(hashes)).all()
+    return {blob.hash: blob.text for blob in blobs}
+
+def load_files(text: Optional[str]) -> Optional[List[Dict[str, str]]]:
+    return json.loads(text) if text else None
+
+def collect_garbage(db: Session) -> int:
+    """Delete blobs no submission references; returns the number deleted"""
+    referenced = or_(
+        models.CodeBlob.hash.in_(select(models.Submission.code_hash).where(models.Submission.code_hash.isnot(None))),
+        models.CodeBlob.hash.in_(select(models.Submission.files_hash).where(models.Submission.files_hash.isnot(None)))
+    )
+    deleted = db.query(models.CodeBlob).filter(~referenced).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if sys.argv[1:] != ["gc"]:
+        print("Usage: python blob_store.py gc")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        print(f"✓ Deleted {collect_garbage(db)} orphaned code blobs")
+    finally:
+        db.close()
@@ -0,0 +1,102 @@
+"""
+Output checkers - how a program's output is judged against the expected output.
+Configured per problem (Problem.checker and friends):
+  exact  - lines compared after stripping trailing whitespace (default)
+  token  - whitespace-separated tokens must match; spacing and line breaks don't matter
+  float  - like token, but numbers may differ by checker_abs_eps or checker_rel_eps
+  custom - a C checker program (Problem.checker_code) decides
+The built-in modes compare in a single streaming pass over str, bytes or mmap buffers.
+
+Custom checkers are compiled once through the executor's compile cache and run
+right after the program, in the same runner thread, as:
+    checker <input file> <expected output file> <actual output file>
+Exit code 0 accepts the output, any other exit code rejects it. A checker that
+times out is reported as an error rather than a wrong answer.
+"""
+import json
+import os
+import subprocess
+import tempfile
+from typing import Dict, Optional
+
+from output_compare import Buffer, numbers_close, output_matches, tokens_equal
+
+CHECKERS = ("exact", "token", "float", "custom")
+CHECKER_TIMEOUT = float(os.getenv("CHECKER_TIMEOUT", "5"))
+
+class CheckerError(Exception):
+    """A custom checker failed to compile or timed out"""
+
+def checker_config(problem) -> Optional[Dict]:
+    """Checker settings of a problem as passed to executors; None for the default exact checker"""
+    if not problem.checker or problem.checker == "exact":
+        return None
+    return {
+        "mode": problem.checker,
+        "abs_eps": problem.checker_abs_eps or 0.0,
+        "rel_eps": problem.checker_rel_eps or 0.0,
+        "code": problem.checker_code if problem.checker == "custom" else None
+    }
+
+def checker_fingerprint(checker: Optional[Dict]) -> str:
+    """Stable string for a checker config - part of the test hash, so changing the checker invalidates reuse"""
+    return json.dumps(checker, sort_keys=True) if checker else ""
+
+def checker_mode(test_case: Dict) -> str:
+    checker = test_case.get("checker")
+    return checker["mode"] if checker else "exact"
+
+def needs_expected(test_case: Dict) -> bool:
+    """Whether checking needs the expected output itself - exact mode gets by with the digest"""
+    return checker_mode(test_case) != "exact" or not test_case.get("expected_digest")
+
+def check_output(actual: Buffer, test_case: Dict, expected: Buffer = None) -> bool:
+    """Judge actual output with the test case's built-in checker (not for custom checkers)"""
+    mode = checker_mode(test_case)
+    if mode == "exact":
+        return output_matches(actual, test_case, expected)
+    if expected is None:
+        expected = test_case["expected_output"]
+    if mode == "token":
+        return tokens_equal(actual, expected)
+    if mode == "float":
+        checker = test_case["checker"]
+        return numbers_close(actual, expected, checker["abs_eps"], checker["rel_eps"])
+    raise CheckerError(f"Unknown checker '{mode}'")
+
+def compile_checker(executor, code: str) -> str:
+    """Compile a custom checker with the executor's compile cache and return the binary path (leased - see LocalExecutor.release)"""
+    binary, compile_error = executor._compile(code)
+    if compile_error is not None:
+        raise CheckerError(f"Checker failed to compile:\n{compile_error}")
+    return binary
+
+def run_checker(checker_binary: str, input_path: str, expected_path: str, actual_path: str) -> bool:
+    """Run a custom checker on files; True when it accepts the output"""
+    try:
+        result = subprocess.run(
+            [checker_binary, input_path, expected_path, actual_path],
+            capture_output=True,
+            timeout=CHECKER_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        raise CheckerError("Checker exceeded time limit")
+    return result.returncode == 0
+
+def run_checker_for(checker_binary: str, test_case: Dict, actual: str = None, actual_path: str = None) -> bool:
+    """run_checker for a test case - inline data (and actual output given as text) is written to temp files first"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def as_file(path: Optional[str], name: str, text: str) -> str:
+            if path:
+                return path
+            path = os.path.join(tmpdir, name)
+            with open(path, "w") as f:
+                f.write(text)
+            return path
+
+        return run_checker(
+            checker_binary,
+            as_file(test_case.get("input_path"), "input", test_case["input"]),
+            as_file(test_case.get("expected_path"), "expected", test_case["expected_output"]),
+            as_file(actual_path, "actual", actual)
+        )
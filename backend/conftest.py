@@ -0,0 +1,40 @@
+"""
+pytest setup: the database modules read their configuration at import time,
+so point them at a throwaway SQLite file before any test imports them.
+"""
+import os
+import tempfile
+
+import pytest
+
+_tmpdir = tempfile.mkdtemp(prefix="hw-grader-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ["TEST_DATA_DIR"] = os.path.join(_tmpdir, "test_data")
+os.environ["ARCHIVE_DIR"] = os.path.join(_tmpdir, "archive")
+
+@pytest.fixture
+def db_schema():
+    """Empty database with the current schema"""
+    import models  # registers the tables on Base.metadata
+    from database import Base, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def seeded(db_schema):
+    """Two students and two problems; returns (user_ids, problem_ids)"""
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        users = [models.User(username=f"student{i}", password_hash="x") for i in range(2)]
+        problems = [models.Problem(title=f"Problem {i}", description="d", difficulty="easy") for i in range(2)]
+        db.add_all(users + problems)
+        db.commit()
+        return [u.id for u in users], [p.id for p in problems]
+    finally:
+        db.close()
@@ -0,0 +1,75 @@
+"""
+Column types that transparently compress large values.
+Values at or above COMPRESS_THRESHOLD bytes are stored as zlib-compressed BLOBs
+with a one-byte marker; smaller values stay plain TEXT. Reads accept both, so
+existing uncompressed rows keep working and can be compressed later by migrations.py.
+On SQLite the column is TEXT - its type affinity keeps BLOBs as they are, so
+plain and compressed values share the column. Other databases get a binary
+column, and small values are stored there as UTF-8 bytes.
+Decompression only happens when the column is actually selected - queries that
+skip it (with_entities, load_only) never pay for it.
+"""
+import json
+import os
+import zlib
+
+from sqlalchemy.types import LargeBinary, Text, TypeDecorator
+
+COMPRESS_THRESHOLD = int(os.getenv("COMPRESS_THRESHOLD", "1024"))
+COMPRESS_LEVEL = 6
+MARKER = b"\x01"  # leads every compressed value - never the first byte of stored text
+
+def compress_value(text: str, threshold: int = COMPRESS_THRESHOLD):
+    data = text.encode()
+    if len(data) < threshold:
+        return text
+    return MARKER + zlib.compress(data, COMPRESS_LEVEL)
+
+def decompress_value(value):
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value[:1] == MARKER:
+            return zlib.decompress(value[1:]).decode()
+        return value.decode()
+    return value
+
+class CompressedColumn(TypeDecorator):
+    """TEXT holding plain text or compressed BLOBs on SQLite, a binary column elsewhere"""
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(LargeBinary())
+
+    def compress(self, text: str, dialect):
+        value = compress_value(text)
+        if isinstance(value, str) and dialect.name != "sqlite":
+            return value.encode()
+        return value
+
+class CompressedText(CompressedColumn):
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self.compress(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        return decompress_value(value)
+
+class CompressedJSON(CompressedColumn):
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self.compress(json.dumps(value), dialect)
+
+    def process_result_value(self, value, dialect):
+        value = decompress_value(value)
+        if value is None:
+            return None
+        return json.loads(value)
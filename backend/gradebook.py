@@ -0,0 +1,79 @@
+"""
+Gradebook: best score, attempt count and first full-score time per user and problem.
+The best_scores table is maintained in the transaction that stores each
+submission (record_submission, called by the submission writer), so the
+gradebook reads one small row per user and problem instead of aggregating
+submissions. Regrades and archiving change past scores; they recompute the
+affected pairs from submissions (refresh_best_scores). rebuild_best_scores
+recomputes everything - for existing databases or after manual edits.
+
+Usage: python gradebook.py rebuild
+"""
+import sys
+from typing import Iterable, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models
+
+ACCEPTED_SCORE = 100.0  # a submission with a full score counts as accepted
+
+AGGREGATE_SQL = f"""
+    SELECT user_id, problem_id, COALESCE(MAX(score), 0), COUNT(*),
+           MIN(CASE WHEN status = 'completed' AND score >= {ACCEPTED_SCORE} THEN created_at END)
+    FROM submissions
+"""
+INSERT_SQL = "INSERT INTO best_scores (user_id, problem_id, best_score, attempts, first_accepted_at)"
+
+# Named parameters work with both SQLAlchemy text() and sqlite3 (archive.py)
+DELETE_PAIR_SQL = "DELETE FROM best_scores WHERE user_id = :user_id AND problem_id = :problem_id"
+REFRESH_PAIR_SQL = f"""
+    {INSERT_SQL}
+    {AGGREGATE_SQL}
+    WHERE user_id = :user_id AND problem_id = :problem_id
+    GROUP BY user_id, problem_id
+"""
+
+def is_accepted(status: str, score: float) -> bool:
+    return status == "completed" and (score or 0) >= ACCEPTED_SCORE
+
+def record_submission(db: Session, submission: models.Submission):
+    """Fold a new, flushed submission into its best_scores row (caller commits)"""
+    best = db.get(models.BestScore, (submission.user_id, submission.problem_id))
+    if best is None:
+        best = models.BestScore(user_id=submission.user_id, problem_id=submission.problem_id, best_score=0.0, attempts=0)
+        db.add(best)
+    best.attempts += 1
+    best.best_score = max(best.best_score, submission.score or 0)
+    if best.first_accepted_at is None and is_accepted(submission.status, submission.score):
+        best.first_accepted_at = submission.created_at
+    db.flush()  # the next submission of the group finds this row by primary key
+
+def refresh_best_scores(db: Session, pairs: Iterable[Tuple[int, int]]):
+    """Recompute the rows of (user_id, problem_id) pairs whose submissions changed (caller commits)"""
+    for user_id, problem_id in set(pairs):
+        params = {"user_id": user_id, "problem_id": problem_id}
+        db.execute(text(DELETE_PAIR_SQL), params)
+        db.execute(text(REFRESH_PAIR_SQL), params)
+
+def rebuild_best_scores(db: Session) -> int:
+    """Recompute the whole table from submissions (one scan); returns the number of rows"""
+    db.query(models.BestScore).delete(synchronize_session=False)
+    db.execute(text(f"{INSERT_SQL} {AGGREGATE_SQL} GROUP BY user_id, problem_id"))
+    db.commit()
+    return db.query(models.BestScore).count()
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python gradebook.py rebuild")
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"✓ Rebuilt {rebuild_best_scores(db)} best-score rows")
+    finally:
+        db.close()
@@ -0,0 +1,114 @@
+"""
+Grading shared by live submissions and admin regrades.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import models
+from judge0_client import judge0_client
+from result_cache import NON_CACHEABLE_STATUSES, result_cache, test_set_version
+from results_store import current_test_hash
+from testdata_store import test_data_store
+
+logger = logging.getLogger(__name__)
+
+def executor_test_case(tc: models.TestCase, checker: Optional[Dict] = None) -> Dict:
+    """
+    Executor input for a test case. File-backed data is passed by path
+    (input/expected_output are then empty) so it is never loaded into memory.
+    """
+    return {
+        "id": tc.id,
+        "hash": current_test_hash(tc, checker),
+        "checker": checker,
+        "input": tc.input_inline,
+        "expected_output": tc.expected_inline,
+        "input_path": test_data_store.path(tc.input_ref) if tc.input_ref else None,
+        "expected_path": test_data_store.path(tc.expected_ref) if tc.expected_ref else None,
+        "expected_digest": tc.expected_digest
+    }
+
+def score_results(results: List[Dict]) -> Tuple[str, float]:
+    """Return (status, score) for a list of per-test results"""
+    if any(r.get("compile_output") for r in results):
+        return "compilation_error", 0
+    passed_count = sum(1 for r in results if r.get("passed", False))
+    total_count = len(results)
+    score = (passed_count / total_count * 100) if total_count > 0 else 0
+    return "completed", score
+
+async def grade_code(
+    problem_id: int,
+    hidden_test_cases: List[Dict[str, str]],
+    source_code: str,
+    additional_files: Optional[List[Dict[str, str]]] = None
+) -> Tuple[str, float, List[Dict]]:
+    """
+    Run code against a problem's hidden tests and score it.
+    Identical (after normalization) code against the same tests reuses stored results.
+    Returns (status, score, results); execution failures propagate to the caller.
+    """
+    cache_key = result_cache.key(
+        problem_id,
+        test_set_version(hidden_test_cases),
+        source_code,
+        additional_files
+    )
+    results = result_cache.get(cache_key)
+    if results is not None:
+        logger.info(f"Result cache hit on problem {problem_id}")
+    else:
+        results = await judge0_client.execute_code(source_code, hidden_test_cases, additional_files)
+        # Key every result by the test it came from, so later regrades can reuse it
+        for tc, result in zip(hidden_test_cases, results):
+            result["test_case_id"] = tc["id"]
+            result["test_hash"] = tc["hash"]
+        result_cache.put(cache_key, results)
+
+    status, score = score_results(results)
+    return status, score, results
+
+def reusable_results(hidden_test_cases: List[Dict], previous_results) -> Dict[int, Dict]:
+    """
+    Previous per-test results whose test case still exists with the same content.
+    Compile errors and executor errors/timeouts are always run again.
+    """
+    if not isinstance(previous_results, list):
+        return {}
+    current = {tc["id"]: tc["hash"] for tc in hidden_test_cases}
+    return {
+        r["test_case_id"]: r
+        for r in previous_results
+        if r.get("test_case_id") in current
+        and r.get("test_hash") == current[r["test_case_id"]]
+        and not r.get("compile_output")
+        and r.get("status") not in NON_CACHEABLE_STATUSES
+    }
+
+async def regrade_code(
+    problem_id: int,
+    hidden_test_cases: List[Dict],
+    source_code: str,
+    previous_results,
+    additional_files: Optional[List[Dict[str, str]]] = None
+) -> Tuple[str, float, List[Dict], int]:
+    """
+    Regrade against the current hidden tests, executing only tests that were added or
+    modified since previous_results. Results of removed tests are dropped.
+    Returns (status, score, merged results, number of tests executed).
+    """
+    reusable = reusable_results(hidden_test_cases, previous_results)
+    pending = [tc for tc in hidden_test_cases if tc["id"] not in reusable]
+
+    fresh: Dict[int, Dict] = {}
+    if pending:
+        status, _, results = await grade_code(problem_id, pending, source_code, additional_files)
+        if status == "compilation_error":
+            # Nothing to merge with - report the compile error against every test
+            status, score, results = await grade_code(problem_id, hidden_test_cases, source_code, additional_files)
+            return status, score, results, len(hidden_test_cases)
+        fresh = {r["test_case_id"]: r for r in results}
+
+    merged = [reusable.get(tc["id"]) or fresh[tc["id"]] for tc in hidden_test_cases]
+    status, score = score_results(merged)
+    return status, score, merged, len(pending)
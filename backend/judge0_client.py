@@ -7,6 +7,8 @@ import base64
 import zipfile
 import io
 from local_executor import LocalExecutor
+from checkers import check_output, checker_mode, compile_checker, run_checker_for
+from testdata_store import load_text
 
 load_dotenv(override=True)
 
@@ -23,6 +25,7 @@ class Judge0Client:
     def __init__(self):
         self.mode = JUDGE0_MODE
         self.local_executor = LocalExecutor() if self.mode == "local" else None
+        self.checker_executor = self.local_executor  # compiles custom checkers; created on first use in remote modes
 
         if self.mode == "local":
             print("ℹ️  Using LOCAL execution mode - compiles once, runs all test cases (FAST!)")
@@ -47,22 +50,15 @@ class Judge0Client:
             print("⚠️  Invalid Judge0 mode. Falling back to mock mode.")
             self.mode = "mock"
 
-    def _compare_outputs(self, actual: str, expected: str) -> bool:
-        """
-        Compare outputs with whitespace tolerance.
-        Strips trailing whitespace from each line and compares.
-        """
-        # Strip trailing whitespace from each line and from the end
-        actual_lines = [line.rstrip() for line in actual.splitlines()]
-        expected_lines = [line.rstrip() for line in expected.splitlines()]
-
-        # Remove trailing empty lines
-        while actual_lines and not actual_lines[-1]:
-            actual_lines.pop()
-        while expected_lines and not expected_lines[-1]:
-            expected_lines.pop()
+    def compile_checker(self, code: str) -> str:
+        """Compile a custom checker (cached) and return its binary path - raises CheckerError; release it when done"""
+        if self.checker_executor is None:
+            self.checker_executor = LocalExecutor()
+        return compile_checker(self.checker_executor, code)
 
-        return actual_lines == expected_lines
+    def release_checker(self, checker_binary: str):
+        """Let the compile cache evict a checker binary returned by compile_checker"""
+        self.checker_executor.release(checker_binary)
 
     def _encode_base64(self, text: str) -> str:
         """Encode text to base64"""
@@ -182,10 +178,10 @@ gcc -o program {' '.join(c_files)} -lm -Wall
             "message": None
         }
 
-    async def _process_result(self, result: Dict, test_case: Dict[str, str]) -> Dict:
+    async def _process_result(self, result: Dict, test_case: Dict[str, str], checker_binary: Optional[str] = None) -> Dict:
         """Process a Judge0 submission result into our format"""
         stdout = result.get("stdout") or ""
-        expected = test_case["expected_output"]
+        expected = load_text(test_case, "expected_output")
         status_id = result.get("status", {}).get("id", 0)
         status_desc = result.get("status", {}).get("description", "Unknown")
 
@@ -228,8 +224,12 @@ gcc -o program {' '.join(c_files)} -lm -Wall
                 "message": result.get("message")
             }
 
-        # Compare outputs with whitespace tolerance
-        passed = self._compare_outputs(stdout, expected)
+        # Judge the output with the problem's checker
+        if checker_binary:
+            loop = asyncio.get_event_loop()
+            passed = await loop.run_in_executor(None, run_checker_for, checker_binary, test_case, stdout)
+        else:
+            passed = check_output(stdout, test_case, expected)
 
         return {
             "input": test_case["input"],
@@ -269,87 +269,98 @@ gcc -o program {' '.join(c_files)} -lm -Wall
         if self.mode == "mock":
             return self._mock_execute(source_code, test_cases)
 
-        # NEW STRATEGY: Submit all test cases as INDIVIDUAL parallel requests
-        # This hits all 32 workers at once instead of batch processing
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async def submit_and_poll(test_case):
-                """Submit ONE test case and poll until complete"""
-                try:
-                    # Use multi-file mode (language ID 89) if additional files present
-                    if additional_files:
-                        payload = {
-                            "language_id": MULTI_FILE_LANGUAGE_ID,
-                            "stdin": self._encode_base64(test_case["input"]),
-                            "additional_files": self._create_multifile_zip(source_code, additional_files)
-                        }
-                        # Note: source_code is NOT included in payload for language ID 89
-                    else:
-                        # Standard single-file C submission
-                        payload = {
-                            "language_id": C_LANGUAGE_ID,
-                            "source_code": self._encode_base64(source_code),
-                            "stdin": self._encode_base64(test_case["input"]),
-                        }
+        # Custom checkers run locally on the returned output - compile once up front
+        checker_binary = None
+        custom = next((tc["checker"] for tc in test_cases if checker_mode(tc) == "custom"), None)
+        if custom:
+            loop = asyncio.get_event_loop()
+            checker_binary = await loop.run_in_executor(None, self.compile_checker, custom["code"])
 
-                    response = await client.post(
-                        f"{self.base_url}/submissions",
-                        json=payload,
-                        headers=self.headers,
-                        params={"base64_encoded": "true"}
-                    )
-                    response.raise_for_status()
-                    token = response.json()["token"]
-
-                    # Poll aggressively until done
-                    for _ in range(500):  # 50 seconds max
-                        result = await client.get(
-                            f"{self.base_url}/submissions/{token}",
+        try:
+            # NEW STRATEGY: Submit all test cases as INDIVIDUAL parallel requests
+            # This hits all 32 workers at once instead of batch processing
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                async def submit_and_poll(test_case):
+                    """Submit ONE test case and poll until complete"""
+                    try:
+                        # Use multi-file mode (language ID 89) if additional files present
+                        if additional_files:
+                            payload = {
+                                "language_id": MULTI_FILE_LANGUAGE_ID,
+                                "stdin": self._encode_base64(load_text(test_case, "input")),
+                                "additional_files": self._create_multifile_zip(source_code, additional_files)
+                            }
+                            # Note: source_code is NOT included in payload for language ID 89
+                        else:
+                            # Standard single-file C submission
+                            payload = {
+                                "language_id": C_LANGUAGE_ID,
+                                "source_code": self._encode_base64(source_code),
+                                "stdin": self._encode_base64(load_text(test_case, "input")),
+                            }
+
+                        response = await client.post(
+                            f"{self.base_url}/submissions",
+                            json=payload,
                             headers=self.headers,
                             params={"base64_encoded": "true"}
                         )
-                        result.raise_for_status()
-                        result_json = result.json()
-
-                        # Decode base64 fields
-                        if result_json.get("stdout"):
-                            result_json["stdout"] = self._decode_base64(result_json["stdout"])
-                        if result_json.get("stderr"):
-                            result_json["stderr"] = self._decode_base64(result_json["stderr"])
-                        if result_json.get("compile_output"):
-                            result_json["compile_output"] = self._decode_base64(result_json["compile_output"])
-                        if result_json.get("message"):
-                            result_json["message"] = self._decode_base64(result_json["message"])
-
-                        status_id = result_json.get("status", {}).get("id")
-                        if status_id and status_id > 2:  # Done
-                            return await self._process_result(result_json, test_case)
-
-                        await asyncio.sleep(0.1)  # Poll every 0.1 seconds
-
-                    # Timeout
-                    return {
-                        "input": test_case["input"],
-                        "expected_output": test_case["expected_output"],
-                        "actual_output": "",
-                        "passed": False,
-                        "status": "Time Limit Exceeded",
-                        "error": "Polling timeout"
-                    }
-
-                except Exception as e:
-                    return {
-                        "input": test_case["input"],
-                        "expected_output": test_case["expected_output"],
-                        "actual_output": "",
-                        "passed": False,
-                        "status": "Error",
-                        "error": str(e)
-                    }
-
-            # Fire off ALL submissions in parallel - each gets its own worker
-            tasks = [submit_and_poll(tc) for tc in test_cases]
-            results = await asyncio.gather(*tasks)
-            return list(results)
+                        response.raise_for_status()
+                        token = response.json()["token"]
+
+                        # Poll aggressively until done
+                        for _ in range(500):  # 50 seconds max
+                            result = await client.get(
+                                f"{self.base_url}/submissions/{token}",
+                                headers=self.headers,
+                                params={"base64_encoded": "true"}
+                            )
+                            result.raise_for_status()
+                            result_json = result.json()
+
+                            # Decode base64 fields
+                            if result_json.get("stdout"):
+                                result_json["stdout"] = self._decode_base64(result_json["stdout"])
+                            if result_json.get("stderr"):
+                                result_json["stderr"] = self._decode_base64(result_json["stderr"])
+                            if result_json.get("compile_output"):
+                                result_json["compile_output"] = self._decode_base64(result_json["compile_output"])
+                            if result_json.get("message"):
+                                result_json["message"] = self._decode_base64(result_json["message"])
+
+                            status_id = result_json.get("status", {}).get("id")
+                            if status_id and status_id > 2:  # Done
+                                return await self._process_result(result_json, test_case, checker_binary)
+
+                            await asyncio.sleep(0.1)  # Poll every 0.1 seconds
+
+                        # Timeout
+                        return {
+                            "input": test_case["input"],
+                            "expected_output": test_case["expected_output"],
+                            "actual_output": "",
+                            "passed": False,
+                            "status": "Time Limit Exceeded",
+                            "error": "Polling timeout"
+                        }
+
+                    except Exception as e:
+                        return {
+                            "input": test_case["input"],
+                            "expected_output": test_case["expected_output"],
+                            "actual_output": "",
+                            "passed": False,
+                            "status": "Error",
+                            "error": str(e)
+                        }
+
+                # Fire off ALL submissions in parallel - each gets its own worker
+                tasks = [submit_and_poll(tc) for tc in test_cases]
+                results = await asyncio.gather(*tasks)
+                return list(results)
+        finally:
+            if checker_binary:
+                self.release_checker(checker_binary)
 
     def _mock_execute(self, source_code: str, test_cases: List[Dict[str, str]]) -> List[Dict]:
         """Mock execution for testing without Judge0 API"""
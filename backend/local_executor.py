@@ -2,40 +2,122 @@
 Local C code executor - compiles once and runs multiple test cases
 This is MUCH faster than Judge0 for multiple test cases (compiles once vs 13 times)
 Supports multiple source files, headers, and stack overflow detection
+Compiled binaries are cached by source hash, so re-running unchanged code skips gcc.
+Every execution holds a lease on the binaries it runs; an evicted binary is only
+deleted once its last lease is released.
 """
 import subprocess
 import tempfile
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Union
 import asyncio
 import base64
+import contextlib
+import hashlib
+import mmap
 import signal
+import threading
+from collections import OrderedDict
+
+from checkers import check_output, checker_mode, compile_checker, needs_expected, run_checker_for
+
+COMPILE_FLAGS = ["-lm", "-Wall"]
+COMPILE_CACHE_SIZE = int(os.getenv("COMPILE_CACHE_SIZE", "256"))  # binaries kept on disk
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR")  # defaults to a private temp dir
+OUTPUT_PREVIEW_LIMIT = 4000  # characters of file-backed test data/output kept in results
 
 class LocalExecutor:
-    def __init__(self, timeout: float = 2.0):
+    def __init__(self, timeout: float = 2.0, cache_size: int = COMPILE_CACHE_SIZE, cache_dir: Optional[str] = COMPILE_CACHE_DIR):
         self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir or tempfile.mkdtemp(prefix="hw-grader-bin-")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # compile key -> None (binary on disk) or compiler output (failed build)
+        self._compile_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        # compile key -> executions using the binary; evicted keys still leased are deleted on release
+        self._leases: Dict[str, int] = {}
+        self._evicted: Set[str] = set()
+        self._cache_lock = threading.Lock()
 
-    def _compare_outputs(self, actual: str, expected: str) -> bool:
-        """Compare outputs with whitespace tolerance"""
-        actual_lines = [line.rstrip() for line in actual.splitlines()]
-        expected_lines = [line.rstrip() for line in expected.splitlines()]
+    async def execute_code(self, source_code: str, test_cases: List[Dict[str, str]], additional_files: Optional[List[Dict[str, str]]] = None) -> List[Dict]:
+        """Compile once (or reuse a cached binary) and run against all test cases - supports multiple files"""
+        loop = asyncio.get_event_loop()
+        binary_file, compile_error = await loop.run_in_executor(
+            None,
+            self._compile,
+            source_code,
+            additional_files
+        )
 
-        # Remove trailing empty lines
-        while actual_lines and not actual_lines[-1]:
-            actual_lines.pop()
-        while expected_lines and not expected_lines[-1]:
-            expected_lines.pop()
+        if compile_error is not None:
+            # Compilation failed - return error for all test cases
+            return [
+                {
+                    "input": tc["input"],
+                    "expected_output": tc["expected_output"],
+                    "actual_output": "",
+                    "passed": False,
+                    "status": "Compilation Error",
+                    "compile_output": compile_error,
+                    "stderr": None,
+                    "time": None,
+                    "memory": None
+                }
+                for tc in test_cases
+            ]
 
-        return actual_lines == expected_lines
+        checker_binary = None
+        try:
+            # A custom checker (the same for every test of a problem) is compiled once and cached like any binary
+            custom = next((tc["checker"] for tc in test_cases if checker_mode(tc) == "custom"), None)
+            if custom:
+                checker_binary = await loop.run_in_executor(None, compile_checker, self, custom["code"])
 
-    async def execute_code(self, source_code: str, test_cases: List[Dict[str, str]], additional_files: Optional[List[Dict[str, str]]] = None) -> List[Dict]:
-        """Compile once and run against all test cases - supports multiple files"""
-        results = []
+            # Compilation succeeded - run all test cases in parallel
+            tasks = [self._run_test_case(binary_file, tc, checker_binary) for tc in test_cases]
+            results = await asyncio.gather(*tasks)
+            return list(results)
+        finally:
+            self.release(binary_file)
+            if checker_binary:
+                self.release(checker_binary)
+
+    def _compile_key(self, source_code: str, additional_files: Optional[List[Dict[str, str]]]) -> str:
+        """Hash of every input that affects the compiled binary"""
+        digest = hashlib.sha256()
+        digest.update(" ".join(COMPILE_FLAGS).encode())
+        digest.update(b"\0")
+        digest.update(source_code.encode())
+        for file_data in sorted(additional_files or [], key=lambda f: f['filename']):
+            digest.update(b"\0")
+            digest.update(file_data['filename'].encode())
+            digest.update(b"\0")
+            digest.update(file_data['content'].encode())
+        return digest.hexdigest()
+
+    def _compile(self, source_code: str, additional_files: Optional[List[Dict[str, str]]] = None):
+        """
+        Compile sources into the binary cache (runs in thread pool).
+        Returns (binary_path, None) on success or (None, compile_output) on failure.
+        Identical sources - e.g. repeated runs while debugging - skip gcc entirely.
+        A returned binary is leased - pass it to release() once it is no longer run.
+        """
+        key = self._compile_key(source_code, additional_files)
+        binary_file = os.path.join(self.cache_dir, key)
+
+        with self._cache_lock:
+            if key in self._compile_cache:
+                self._compile_cache.move_to_end(key)
+                compile_error = self._compile_cache[key]
+                if compile_error is not None:
+                    return None, compile_error
+                if os.path.exists(binary_file):
+                    self._leases[key] = self._leases.get(key, 0) + 1
+                    return binary_file, None
 
         # Create temporary directory for compilation
         with tempfile.TemporaryDirectory() as tmpdir:
             source_file = os.path.join(tmpdir, "solution.c")
-            binary_file = os.path.join(tmpdir, "solution")
 
             # Write main source code to file
             with open(source_file, 'w') as f:
@@ -66,8 +148,9 @@ class LocalExecutor:
                     if filename.endswith('.c'):
                         source_files.append(file_path)
 
-            # Compile the code ONCE with all source files
-            compile_cmd = ["gcc", "-o", binary_file] + source_files + ["-lm", "-Wall"]
+            # Compile to a private path, then rename into the cache atomically
+            tmp_binary = os.path.join(tmpdir, "solution")
+            compile_cmd = ["gcc", "-o", tmp_binary] + source_files + COMPILE_FLAGS
             try:
                 compile_result = subprocess.run(
                     compile_cmd,
@@ -75,49 +158,56 @@ class LocalExecutor:
                     text=True,
                     timeout=10
                 )
+            except subprocess.TimeoutExpired:
+                # Not cached - a timeout may be caused by load rather than the code
+                return None, "Compilation timeout"
 
-                if compile_result.returncode != 0:
-                    # Compilation failed - return error for all test cases
-                    for tc in test_cases:
-                        results.append({
-                            "input": tc["input"],
-                            "expected_output": tc["expected_output"],
-                            "actual_output": "",
-                            "passed": False,
-                            "status": "Compilation Error",
-                            "compile_output": compile_result.stderr,
-                            "stderr": None,
-                            "time": None,
-                            "memory": None
-                        })
-                    return results
+            if compile_result.returncode != 0:
+                compile_error = compile_result.stderr
+            else:
+                compile_error = None
+                os.replace(tmp_binary, binary_file)
 
-            except subprocess.TimeoutExpired:
-                for tc in test_cases:
-                    results.append({
-                        "input": tc["input"],
-                        "expected_output": tc["expected_output"],
-                        "actual_output": "",
-                        "passed": False,
-                        "status": "Compilation Error",
-                        "compile_output": "Compilation timeout",
-                        "stderr": None,
-                        "time": None,
-                        "memory": None
-                    })
-                return results
-
-            # Compilation succeeded - run against all test cases
-            tasks = []
-            for tc in test_cases:
-                tasks.append(self._run_test_case(binary_file, tc))
-
-            # Run all test cases in parallel
-            results = await asyncio.gather(*tasks)
-            return list(results)
+        self._remember(key, compile_error)
+        return (binary_file if compile_error is None else None), compile_error
 
-    async def _run_test_case(self, binary_file: str, test_case: Dict[str, str]) -> Dict:
+    def _remember(self, key: str, compile_error: Optional[str]):
+        """Record a compile outcome (leasing a new binary), evicting least recently used binaries"""
+        with self._cache_lock:
+            self._compile_cache[key] = compile_error
+            self._compile_cache.move_to_end(key)
+            if compile_error is None:
+                self._leases[key] = self._leases.get(key, 0) + 1
+                self._evicted.discard(key)
+            while len(self._compile_cache) > self.cache_size:
+                evicted, _ = self._compile_cache.popitem(last=False)
+                if evicted in self._leases:
+                    self._evicted.add(evicted)  # still running - deleted by the last release
+                else:
+                    self._remove_binary(evicted)
+
+    def release(self, binary_file: str):
+        """End a lease taken by _compile; deletes the binary if it was evicted meanwhile"""
+        key = os.path.basename(binary_file)
+        with self._cache_lock:
+            self._leases[key] -= 1
+            if self._leases[key] == 0:
+                del self._leases[key]
+                if key in self._evicted:
+                    self._evicted.discard(key)
+                    self._remove_binary(key)
+
+    def _remove_binary(self, key: str):
+        try:
+            os.remove(os.path.join(self.cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+    async def _run_test_case(self, binary_file: str, test_case: Dict[str, str], checker_binary: Optional[str] = None) -> Dict:
         """Run compiled binary against a single test case"""
+        # File-backed tests are reported with a preview of their data
+        shown_input = self._preview(test_case["input_path"]) if test_case.get("input_path") else test_case["input"]
+        shown_expected = self._preview(test_case["expected_path"]) if test_case.get("expected_path") else test_case["expected_output"]
         try:
             # Run in executor to avoid blocking
             loop = asyncio.get_event_loop()
@@ -125,10 +215,11 @@ class LocalExecutor:
                 None,
                 self._execute_binary,
                 binary_file,
-                test_case["input"]
+                test_case,
+                checker_binary
             )
 
-            stdout, stderr, returncode, execution_time = result
+            stdout, stderr, returncode, execution_time, passed = result
 
             # Check for runtime error with detailed error type detection
             if returncode != 0 or stderr:
@@ -144,8 +235,8 @@ class LocalExecutor:
                     error_status = "Runtime Error (stderr)"
 
                 return {
-                    "input": test_case["input"],
-                    "expected_output": test_case["expected_output"],
+                    "input": shown_input,
+                    "expected_output": shown_expected,
                     "actual_output": stdout,
                     "passed": False,
                     "status": error_status,
@@ -155,12 +246,9 @@ class LocalExecutor:
                     "memory": None
                 }
 
-            # Compare outputs
-            passed = self._compare_outputs(stdout, test_case["expected_output"])
-
             return {
-                "input": test_case["input"],
-                "expected_output": test_case["expected_output"],
+                "input": shown_input,
+                "expected_output": shown_expected,
                 "actual_output": stdout,
                 "passed": passed,
                 "status": "Accepted" if passed else "Wrong Answer",
@@ -172,8 +260,8 @@ class LocalExecutor:
 
         except subprocess.TimeoutExpired:
             return {
-                "input": test_case["input"],
-                "expected_output": test_case["expected_output"],
+                "input": shown_input,
+                "expected_output": shown_expected,
                 "actual_output": "",
                 "passed": False,
                 "status": "Time Limit Exceeded",
@@ -184,8 +272,8 @@ class LocalExecutor:
             }
         except Exception as e:
             return {
-                "input": test_case["input"],
-                "expected_output": test_case["expected_output"],
+                "input": shown_input,
+                "expected_output": shown_expected,
                 "actual_output": "",
                 "passed": False,
                 "status": "Error",
@@ -195,19 +283,93 @@ class LocalExecutor:
                 "memory": None
             }
 
-    def _execute_binary(self, binary_file: str, stdin_data: str):
-        """Execute binary with input (runs in thread pool)"""
+    def _preview(self, path: str) -> str:
+        with open(path, "rb") as f:
+            data = f.read(OUTPUT_PREVIEW_LIMIT + 1)
+        text = data[:OUTPUT_PREVIEW_LIMIT].decode(errors="replace")
+        return text + "\n... (truncated)" if len(data) > OUTPUT_PREVIEW_LIMIT else text
+
+    def _execute_binary(self, binary_file: str, test_case: Dict[str, str], checker_binary: Optional[str] = None):
+        """Execute binary with input and check its output (runs in thread pool)"""
+        if test_case.get("input_path") or test_case.get("expected_path"):
+            return self._execute_binary_files(binary_file, test_case, checker_binary)
+
         import time
         start_time = time.time()
 
         result = subprocess.run(
             [binary_file],
-            input=stdin_data,
+            input=test_case["input"],
             capture_output=True,
             text=True,
             timeout=self.timeout
         )
 
         execution_time = time.time() - start_time
+        if checker_binary:
+            passed = run_checker_for(checker_binary, test_case, actual=result.stdout)
+        else:
+            passed = check_output(result.stdout, test_case)
+
+        return result.stdout, result.stderr, result.returncode, execution_time, passed
+
+    def _execute_binary_files(self, binary_file: str, test_case: Dict[str, str], checker_binary: Optional[str] = None):
+        """
+        Execute binary for a file-backed test: stdin is the input file itself and
+        stdout goes to a temp file that is digested, compared against an mmap of the
+        expected file or handed to the custom checker without loading it. Only a
+        preview is read back into memory.
+        """
+        import time
+
+        with tempfile.NamedTemporaryFile() as stdout_file, contextlib.ExitStack() as stack:
+            if test_case.get("input_path"):
+                stdin = stack.enter_context(open(test_case["input_path"], "rb"))
+                stdin_data = None
+            else:
+                stdin = None
+                stdin_data = test_case["input"].encode()
+
+            start_time = time.time()
+            result = subprocess.run(
+                [binary_file],
+                stdin=stdin,
+                input=stdin_data,
+                stdout=stdout_file,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout
+            )
+            execution_time = time.time() - start_time
+
+            if checker_binary:
+                stdout_file.flush()
+                passed = run_checker_for(checker_binary, test_case, actual_path=stdout_file.name)
+            else:
+                if not needs_expected(test_case):
+                    expected = b""  # the precomputed digest is enough - no need to map the expected file
+                elif test_case.get("expected_path"):
+                    expected_file = stack.enter_context(open(test_case["expected_path"], "rb"))
+                    expected = _map(expected_file)
+                else:
+                    expected = test_case["expected_output"].encode()
+                actual = _map(stdout_file)
+                passed = check_output(actual, test_case, expected)
+                for buffer in (actual, expected):
+                    if isinstance(buffer, mmap.mmap):
+                        buffer.close()
+
+            stdout_file.seek(0)
+            data = stdout_file.read(OUTPUT_PREVIEW_LIMIT + 1)
+            stdout = data[:OUTPUT_PREVIEW_LIMIT].decode(errors="replace")
+            if len(data) > OUTPUT_PREVIEW_LIMIT:
+                stdout += "\n... (truncated)"
+
+        stderr = result.stderr.decode(errors="replace")
+        return stdout, stderr, result.returncode, execution_time, passed
 
-        return result.stdout, result.stderr, result.returncode, execution_time
+def _map(f) -> Union[mmap.mmap, bytes]:
+    """Read-only mmap of a file (empty files cannot be mapped)"""
+    f.flush()
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -1,7 +1,10 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload, undefer
+from typing import List, Optional
+from pydantic import TypeAdapter
 import json
 import logging
 import os
@@ -11,15 +14,28 @@ from slowapi.errors import RateLimitExceeded
 
 import models
 import schemas
-from database import get_db, init_db
+from database import get_db, get_read_db, init_db, run_db
+from passwords import get_password_hash_async, get_password_hashes_async, login_slots
 from auth import (
-    get_password_hash,
     authenticate_user,
     create_access_token,
     get_current_user,
-    get_current_admin
+    get_current_admin,
+    invalidate_user,
+    CurrentUser
 )
 from judge0_client import judge0_client
+from result_cache import result_cache
+from grading import grade_code, score_results
+from snapshot_cache import VISIBLE_TEST_CASE_LIMIT, bump_revision, test_set_cache
+from response_cache import response_cache
+from pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, paginate
+from checkers import CheckerError
+from regrade import regrader
+from submission_writer import NewSubmission, submission_writer
+from roster import RosterError, apply_import, import_report, parse_roster, plan_import
+from results_store import submission_detail, submission_dict, submission_dicts
+from archive import archive_data_store, list_archives, open_archive
 
 # Configure logging
 logging.basicConfig(
@@ -47,8 +63,9 @@ app.add_middleware(
 
 # Initialize database on startup
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    regrader.resume_interrupted()
 
 # Health check
 @app.get("/")
@@ -59,7 +76,12 @@ def read_root():
 
 @app.post("/api/auth/register", response_model=schemas.UserResponse)
 @limiter.limit("5/minute")
-def register(request: Request, user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(
+    request: Request,
+    user: schemas.UserCreate,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
     logger.info(f"Registration attempt for username: {user.username}")
 
     # Validate username and password
@@ -68,30 +90,41 @@ def register(request: Request, user: schemas.UserCreate, db: Session = Depends(g
     if len(user.password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
 
-    # Check if username already exists
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    # Check if username already exists - on the read pool, so the writer is not held while hashing
+    db_user = await run_db(lambda: read_db.query(models.User).filter(models.User.username == user.username).first())
     if db_user:
         logger.warning(f"Registration failed: Username {user.username} already exists")
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(
-        username=user.username,
-        password_hash=hashed_password,
-        role="student"
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # Create new user - hashing shares the login budget and process pool
+    async with login_slots:
+        hashed_password = await get_password_hash_async(user.password)
+
+    def create_user():
+        db_user = models.User(
+            username=user.username,
+            password_hash=hashed_password,
+            role="student"
+        )
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return db_user
+
+    try:
+        db_user = await run_db(create_user)
+    except IntegrityError:
+        await run_db(db.rollback)
+        raise HTTPException(status_code=400, detail="Username already registered")
     logger.info(f"User registered successfully: {user.username}")
     return db_user
 
 @app.post("/api/auth/login", response_model=schemas.Token)
 @limiter.limit("10/minute")
-def login(request: Request, user: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(request: Request, user: schemas.UserLogin, db: Session = Depends(get_read_db)):
     logger.info(f"Login attempt for username: {user.username}")
-    db_user = authenticate_user(db, user.username, user.password)
+    async with login_slots:
+        db_user = await authenticate_user(db, user.username, user.password)
     if not db_user:
         logger.warning(f"Login failed for username: {user.username}")
         raise HTTPException(
@@ -106,36 +139,52 @@ def login(request: Request, user: schemas.UserLogin, db: Session = Depends(get_d
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/auth/me", response_model=schemas.UserResponse)
-def get_me(current_user: models.User = Depends(get_current_user)):
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
 # ==================== Admin Routes ====================
 
+CHECKER_FIELDS = ('checker', 'checker_abs_eps', 'checker_rel_eps', 'checker_code')
+
+def _validate_checker(problem: models.Problem):
+    """Reject unusable checker settings - custom checkers must compile (call without holding the writer)"""
+    for eps in (problem.checker_abs_eps, problem.checker_rel_eps):
+        if eps is not None and eps < 0:
+            raise HTTPException(status_code=400, detail="Checker tolerances must not be negative")
+    if problem.checker == "custom":
+        if not problem.checker_code:
+            raise HTTPException(status_code=400, detail="Custom checker requires checker_code")
+        try:
+            judge0_client.release_checker(judge0_client.compile_checker(problem.checker_code))
+        except CheckerError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/admin/problems", response_model=schemas.ProblemResponse)
 def create_problem(
     problem: schemas.ProblemCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
     db_problem = models.Problem(**problem.dict())
+    _validate_checker(db_problem)
     db.add(db_problem)
     db.commit()
     db.refresh(db_problem)
+    response_cache.clear()
     return db_problem
 
-@app.get("/api/admin/problems", response_model=List[schemas.ProblemResponse])
+@app.get("/api/admin/problems", response_model=List[schemas.ProblemAdminSummary])
 def get_all_problems_admin(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
-    problems = db.query(models.Problem).all()
-    return problems
+    return _problem_summaries(db)
 
 @app.get("/api/admin/problems/{problem_id}", response_model=schemas.ProblemResponse)
 def get_problem_admin(
     problem_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
     problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
     if not problem:
@@ -147,7 +196,7 @@ def update_problem(
     problem_id: int,
     problem_update: schemas.ProblemUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
     logger.info(f"Admin {current_user.username} updating problem {problem_id}")
     db_problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
@@ -155,14 +204,26 @@ def update_problem(
         raise HTTPException(status_code=404, detail="Problem not found")
 
     # Explicitly update only allowed fields
-    update_data = problem_update.dict(exclude_unset=True)
-    allowed_fields = {'title', 'description', 'difficulty', 'constraints'}
+    allowed_fields = {'title', 'description', 'difficulty', 'constraints', *CHECKER_FIELDS}
+    update_data = {key: value for key, value in problem_update.dict(exclude_unset=True).items() if key in allowed_fields}
+
+    # Compiling a custom checker can take seconds - validate a detached copy of the
+    # new settings after giving the writer connection back
+    checker = models.Problem(**{field: getattr(db_problem, field) for field in CHECKER_FIELDS})
+    for key in CHECKER_FIELDS:
+        if key in update_data:
+            setattr(checker, key, update_data[key])
+    db.rollback()
+    _validate_checker(checker)
+
     for key, value in update_data.items():
-        if key in allowed_fields:
-            setattr(db_problem, key, value)
+        setattr(db_problem, key, value)
+    bump_revision(db, db_problem)  # the checker is part of the test set
 
     db.commit()
     db.refresh(db_problem)
+    test_set_cache.invalidate(problem_id)
+    response_cache.clear()
     logger.info(f"Problem {problem_id} updated successfully")
     return db_problem
 
@@ -170,14 +231,18 @@ def update_problem(
 def delete_problem(
     problem_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
-    db_problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
-    if not db_problem:
+    # One DELETE - test cases, submissions with their results, custom tests and
+    # regrade jobs go with it through ON DELETE CASCADE, without loading them
+    deleted = db.query(models.Problem).filter(models.Problem.id == problem_id).delete(synchronize_session=False)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Problem not found")
-    
-    db.delete(db_problem)
     db.commit()
+    logger.info(f"Admin {current_user.username} deleted problem {problem_id}")
+    result_cache.invalidate_problem(problem_id)
+    test_set_cache.invalidate(problem_id)
+    response_cache.clear()
     return {"message": "Problem deleted successfully"}
 
 @app.post("/api/admin/problems/{problem_id}/testcases", response_model=schemas.TestCaseResponse)
@@ -185,7 +250,7 @@ def create_test_case(
     problem_id: int,
     test_case: schemas.TestCaseCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
     # Verify problem exists
     problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
@@ -194,97 +259,338 @@ def create_test_case(
     
     db_test_case = models.TestCase(**test_case.dict(), problem_id=problem_id)
     db.add(db_test_case)
+    bump_revision(db, problem)
     db.commit()
     db.refresh(db_test_case)
+    result_cache.invalidate_problem(problem_id)
+    test_set_cache.invalidate(problem_id)
+    response_cache.clear()
     return db_test_case
 
 @app.delete("/api/admin/testcases/{testcase_id}")
 def delete_test_case(
     testcase_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
     test_case = db.query(models.TestCase).filter(models.TestCase.id == testcase_id).first()
     if not test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
+    problem_id = test_case.problem_id
+    bump_revision(db, test_case.problem)
     db.delete(test_case)
     db.commit()
+    result_cache.invalidate_problem(problem_id)
+    test_set_cache.invalidate(problem_id)
+    response_cache.clear()
     return {"message": "Test case deleted successfully"}
 
-@app.get("/api/admin/submissions", response_model=List[schemas.SubmissionResponse])
+@app.post("/api/admin/regrade", response_model=schemas.RegradeJobResponse)
+async def start_regrade(
+    regrade: schemas.RegradeRequest,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    if regrade.problem_id is None and not regrade.submission_ids:
+        raise HTTPException(status_code=400, detail="Specify a problem_id or submission_ids to regrade")
+    if regrade.problem_id is not None:
+        problem = await run_db(
+            lambda: db.query(models.Problem).filter(models.Problem.id == regrade.problem_id).first()
+        )
+        if not problem:
+            raise HTTPException(status_code=404, detail="Problem not found")
+
+    job = await run_db(regrader.create_job, db, regrade.problem_id, regrade.submission_ids, current_user.id)
+    logger.info(f"Admin {current_user.username} started regrade job {job.id} ({job.total} submissions)")
+    regrader.start(job.id)
+    return job
+
+@app.get("/api/admin/regrade/{job_id}", response_model=schemas.RegradeJobResponse)
+def get_regrade_job(
+    job_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    job = db.query(models.RegradeJob).filter(models.RegradeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    return job
+
+@app.post("/api/admin/regrade/{job_id}/resume", response_model=schemas.RegradeJobResponse)
+async def resume_regrade_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    job = await run_db(
+        lambda: db.query(models.RegradeJob).filter(models.RegradeJob.id == job_id).first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Regrade job already completed")
+    regrader.start(job.id)
+    return job
+
+def admin_submission_page(
+    db: Session,
+    problem_id: Optional[int],
+    user_id: Optional[int],
+    status_filter: Optional[str],
+    min_score: Optional[float],
+    max_score: Optional[float],
+    cursor: Optional[str],
+    limit: int
+):
+    """
+    Newest submissions first, one keyset page at a time (pass next_cursor back as cursor).
+    Summary columns only - code and results are fetched per submission.
+    """
+    query = db.query(
+        models.Submission.id,
+        models.Submission.user_id,
+        models.Submission.problem_id,
+        models.Submission.score,
+        models.Submission.status,
+        models.Submission.created_at,
+        models.User.username,
+        models.Problem.title.label("problem_title")
+    ).join(
+        models.User, models.User.id == models.Submission.user_id
+    ).join(
+        models.Problem, models.Problem.id == models.Submission.problem_id
+    )
+    if problem_id is not None:
+        query = query.filter(models.Submission.problem_id == problem_id)
+    if user_id is not None:
+        query = query.filter(models.Submission.user_id == user_id)
+    if status_filter is not None:
+        query = query.filter(models.Submission.status == status_filter)
+    if min_score is not None:
+        query = query.filter(models.Submission.score >= min_score)
+    if max_score is not None:
+        query = query.filter(models.Submission.score <= max_score)
+
+    try:
+        rows, next_cursor = paginate(query, models.Submission.created_at, models.Submission.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": rows, "next_cursor": next_cursor}
+
+@app.get("/api/admin/submissions", response_model=schemas.AdminSubmissionPage)
 def get_all_submissions(
+    problem_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    return admin_submission_page(db, problem_id, user_id, status_filter, min_score, max_score, cursor, limit)
+
+@app.get("/api/admin/gradebook", response_model=List[schemas.GradebookEntry])
+def get_gradebook(
+    problem_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Best score, attempts and first accepted time per student and problem - one best_scores row each"""
+    query = db.query(
+        models.BestScore.user_id,
+        models.User.username,
+        models.BestScore.problem_id,
+        models.Problem.title.label("problem_title"),
+        models.BestScore.best_score,
+        models.BestScore.attempts,
+        models.BestScore.first_accepted_at
+    ).join(
+        models.User, models.User.id == models.BestScore.user_id
+    ).join(
+        models.Problem, models.Problem.id == models.BestScore.problem_id
+    )
+    if problem_id is not None:
+        query = query.filter(models.BestScore.problem_id == problem_id)
+    if user_id is not None:
+        query = query.filter(models.BestScore.user_id == user_id)
+    return query.order_by(models.User.username, models.BestScore.problem_id).all()
+
+@app.get("/api/admin/submissions/{submission_id}/identical", response_model=List[schemas.SubmissionResponse])
+def get_identical_submissions(
+    submission_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Other submissions with byte-identical source code (index lookup on code_hash)"""
+    submission = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    submissions = db.query(models.Submission).options(
+        selectinload(models.Submission.code_blob),
+        undefer(models.Submission.results)
+    ).filter(
+        models.Submission.code_hash == submission.code_hash,
+        models.Submission.id != submission.id
+    ).order_by(models.Submission.created_at.desc()).all()
+    return submission_dicts(db, submissions)
+
+@app.delete("/api/admin/users/{user_id}")
+def delete_user(
+    user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin)
+    current_user: CurrentUser = Depends(get_current_admin)
 ):
-    submissions = db.query(models.Submission).order_by(models.Submission.created_at.desc()).all()
-    return submissions
+    if user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="You cannot delete your own account")
+    username = db.query(models.User.username).filter(models.User.id == user_id).scalar()
+    if username is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Submissions, their results and custom tests cascade in the database
+    db.query(models.User).filter(models.User.id == user_id).delete(synchronize_session=False)
+    db.commit()
+    invalidate_user(username)  # bulk deletes skip the ORM events that evict cached users
+    logger.info(f"Admin {current_user.username} deleted user {username}")
+    return {"message": "User deleted successfully"}
+
+@app.post("/api/admin/users/import", response_model=schemas.RosterImportResponse)
+async def import_users(
+    file: UploadFile,
+    update_existing: bool = False,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Create accounts from a CSV roster (username,password[,role]) - see roster.py"""
+    try:
+        rows, duplicates = parse_roster((await file.read()).decode("utf-8"))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Roster must be UTF-8 encoded")
+    except RosterError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+
+    # Planned on the read pool so the writer is only held for the final transaction
+    plan = await run_db(plan_import, read_db, rows, duplicates, update_existing)
+    to_hash = plan.create + plan.update
+    hashes = await get_password_hashes_async([row.password for row in to_hash])
+    try:
+        await run_db(apply_import, db, plan, dict(zip((row.username for row in to_hash), hashes)))
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Accounts changed during the import, please retry")
+
+    report = import_report(plan)
+    logger.info(
+        f"Admin {current_user.username} imported roster: {report['created']} created, "
+        f"{report['updated']} updated, {len(report['existing'])} existing, {len(report['duplicates'])} duplicates"
+    )
+    return report
 
 # ==================== Student Routes ====================
 
-@app.get("/api/problems", response_model=List[schemas.ProblemPublic])
+RESULTS_PAGE_SIZE = 50  # per-test results returned with a submission by default
+RESULTS_PAGE_SIZE_MAX = 500
+
+def _additional_files_dict(additional_files):
+    """Convert additional_files from Pydantic models to dicts if present"""
+    if not additional_files:
+        return None
+    return [
+        {"filename": f.filename, "content": f.content}
+        for f in additional_files
+    ]
+
+DESCRIPTION_PREVIEW_LENGTH = 150  # characters of description shown in problem lists
+
+def _problem_summaries(db: Session) -> List[dict]:
+    """
+    Every problem with its test counts in a single aggregate query. Only a
+    preview of the description is read; test case data is never loaded.
+    """
+    hidden_count = func.coalesce(func.sum(case((models.TestCase.is_hidden == True, 1), else_=0)), 0)
+    rows = db.query(
+        models.Problem.id,
+        models.Problem.title,
+        models.Problem.difficulty,
+        models.Problem.created_at,
+        models.Problem.checker,
+        func.substr(models.Problem.description, 1, DESCRIPTION_PREVIEW_LENGTH).label("description_preview"),
+        func.count(models.TestCase.id).label("test_case_count"),
+        hidden_count.label("hidden_test_count")
+    ).outerjoin(
+        models.TestCase, models.TestCase.problem_id == models.Problem.id
+    ).group_by(models.Problem.id).order_by(models.Problem.id).all()
+
+    return [
+        {
+            **row._asdict(),
+            "visible_test_count": min(row.test_case_count - row.hidden_test_count, VISIBLE_TEST_CASE_LIMIT)
+        }
+        for row in rows
+    ]
+
+_problem_summaries_json = TypeAdapter(List[schemas.ProblemSummary])
+
+@app.get("/api/problems", response_model=List[schemas.ProblemSummary])
 def get_problems(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    problems = db.query(models.Problem).all()
-    result = []
-    for problem in problems:
-        visible_test_cases = [
-            tc for tc in problem.test_cases
-            if not tc.is_hidden
-        ]
-        visible_test_cases.sort(key=lambda x: x.display_order if x.display_order is not None else 0)
-        
-        problem_dict = {
-            "id": problem.id,
-            "title": problem.title,
-            "description": problem.description,
-            "difficulty": problem.difficulty,
-            "constraints": problem.constraints,
-            "created_at": problem.created_at,
-            "visible_test_cases": visible_test_cases[:3]  # Only show first 3
-        }
-        result.append(schemas.ProblemPublic(**problem_dict))
-    
-    return result
+    # Any admin change to a problem adds, removes or bumps the revision of a row
+    version = db.query(
+        func.count(models.Problem.id),
+        func.max(models.Problem.id),
+        func.max(models.Problem.created_at),
+        func.coalesce(func.sum(models.Problem.test_set_revision), 0)
+    ).one()
+    key = ("problems", *version)
+    entry = response_cache.get(key)
+    if entry is None:
+        summaries = _problem_summaries_json.validate_python(_problem_summaries(db))
+        entry = response_cache.put(key, _problem_summaries_json.dump_json(summaries))
+    return response_cache.respond(request, entry)
 
 @app.get("/api/problems/{problem_id}", response_model=schemas.ProblemPublic)
 def get_problem(
     problem_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
-    if not problem:
+    revision = db.query(models.Problem.test_set_revision).filter(models.Problem.id == problem_id).scalar()
+    if revision is None:
         raise HTTPException(status_code=404, detail="Problem not found")
-    
-    visible_test_cases = [
-        tc for tc in problem.test_cases
-        if not tc.is_hidden
-    ]
-    # Sort by display_order, treating None as 0
-    visible_test_cases.sort(key=lambda x: x.display_order if x.display_order is not None else 0)
-    
-    problem_dict = {
-        "id": problem.id,
-        "title": problem.title,
-        "description": problem.description,
-        "difficulty": problem.difficulty,
-        "constraints": problem.constraints,
-        "created_at": problem.created_at,
-        "visible_test_cases": visible_test_cases[:3]
-    }
-    
-    return schemas.ProblemPublic(**problem_dict)
+
+    key = ("problem", problem_id, revision)
+    entry = response_cache.get(key)
+    if entry is None:
+        problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
+        if not problem:
+            raise HTTPException(status_code=404, detail="Problem not found")
+        problem_public = schemas.ProblemPublic(
+            id=problem.id,
+            title=problem.title,
+            description=problem.description,
+            difficulty=problem.difficulty,
+            constraints=problem.constraints,
+            created_at=problem.created_at,
+            visible_test_cases=test_set_cache.get(db, problem).visible
+        )
+        entry = response_cache.put(key, problem_public.model_dump_json().encode())
+    return response_cache.respond(request, entry)
 
 @app.post("/api/submit", response_model=schemas.SubmissionResponse)
 @limiter.limit("10/minute")
 async def submit_code(
     request: Request,
     submission: schemas.SubmissionCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     logger.info(f"User {current_user.username} submitting code for problem {submission.problem_id}")
 
@@ -292,97 +598,132 @@ async def submit_code(
     if len(submission.code) > 50000:
         raise HTTPException(status_code=400, detail="Code exceeds maximum length of 50KB")
 
-    # Verify problem exists
-    problem = db.query(models.Problem).filter(models.Problem.id == submission.problem_id).first()
-    if not problem:
+    # Database work runs on the DB thread pool; only grading is awaited on the event loop
+    def load_hidden_test_cases():
+        problem = db.query(models.Problem).filter(models.Problem.id == submission.problem_id).first()
+        # Get only hidden test cases for grading - served from the snapshot cache
+        return list(test_set_cache.get(db, problem).hidden) if problem else None
+
+    hidden_test_cases = await run_db(load_hidden_test_cases)
+    if hidden_test_cases is None:
         logger.warning(f"Submission failed: Problem {submission.problem_id} not found")
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    # Get only hidden test cases for grading
-    hidden_test_cases = [
-        {"input": tc.input, "expected_output": tc.expected_output}
-        for tc in problem.test_cases
-        if tc.is_hidden
-    ]
-
     if not hidden_test_cases:
         logger.error(f"No hidden test cases for problem {submission.problem_id}")
         raise HTTPException(status_code=400, detail="No hidden test cases found for this problem")
 
-    # Execute code against hidden test cases
-    try:
-        # Convert additional_files from Pydantic models to dicts if present
-        additional_files_dict = None
-        if submission.additional_files:
-            additional_files_dict = [
-                {"filename": f.filename, "content": f.content}
-                for f in submission.additional_files
-            ]
-
-        results = await judge0_client.execute_code(submission.code, hidden_test_cases, additional_files_dict)
-
-        # Check for compilation errors
-        compilation_error = next((r for r in results if r.get("compile_output")), None)
-        if compilation_error and compilation_error.get("compile_output"):
-            # Create submission with compilation error
-            db_submission = models.Submission(
-                user_id=current_user.id,
-                problem_id=submission.problem_id,
-                code=submission.code,
-                score=0,
-                status="compilation_error",
-                results=results
-            )
-            db.add(db_submission)
-            db.commit()
-            db.refresh(db_submission)
-            logger.info(f"Submission {db_submission.id} completed with compilation error")
-            return db_submission
-
-        # Calculate score
-        passed_count = sum(1 for r in results if r.get("passed", False))
-        total_count = len(results)
-        score = (passed_count / total_count * 100) if total_count > 0 else 0
+    additional_files_dict = _additional_files_dict(submission.additional_files)
 
-        # Create submission record
-        db_submission = models.Submission(
+    def new_submission(status: str, score: float, results) -> NewSubmission:
+        return NewSubmission(
             user_id=current_user.id,
             problem_id=submission.problem_id,
             code=submission.code,
+            additional_files=additional_files_dict,
+            status=status,
             score=score,
-            status="completed",
             results=results
         )
-        db.add(db_submission)
-        db.commit()
-        db.refresh(db_submission)
 
-        logger.info(f"Submission {db_submission.id} completed with score {score:.1f}%")
-        return db_submission
+    # Execute code against hidden test cases
+    try:
+        status, score, results = await grade_code(
+            submission.problem_id,
+            hidden_test_cases,
+            submission.code,
+            additional_files_dict
+        )
+
+        # Group-committed with concurrent submissions - returns once the row is durable
+        db_submission = await submission_writer.write(new_submission(status, score, results))
+
+        if status == "compilation_error":
+            logger.info(f"Submission {db_submission.id} completed with compilation error")
+        else:
+            logger.info(f"Submission {db_submission.id} completed with score {score:.1f}%")
+
+        # The submitter gets the full results (including actual output) straight from grading
+        return submission_dict(db_submission, results, code=submission.code)
 
     except Exception as e:
         logger.error(f"Execution error for user {current_user.username}: {str(e)}")
         # Create error submission record
-        db_submission = models.Submission(
-            user_id=current_user.id,
-            problem_id=submission.problem_id,
-            code=submission.code,
-            score=0,
-            status="error",
-            results={"error": str(e)}
-        )
-        db.add(db_submission)
-        db.commit()
-        db.refresh(db_submission)
+        await submission_writer.write(new_submission("error", 0, {"error": str(e)}))
+
+        raise HTTPException(status_code=500, detail=f"Execution error: {str(e)}")
+
+@app.post("/api/run", response_model=schemas.RunResponse)
+@limiter.limit("30/minute")
+async def run_code(
+    request: Request,
+    run: schemas.RunRequest,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Run code against the visible and the user's custom test cases.
+    Nothing is persisted - this is the cheap iterate-and-debug path; grading goes through /api/submit.
+    """
+    if len(run.code) > 50000:
+        raise HTTPException(status_code=400, detail="Code exceeds maximum length of 50KB")
+
+    def load_test_cases():
+        problem = db.query(models.Problem).filter(models.Problem.id == run.problem_id).first()
+        if not problem:
+            return None
+
+        snapshot = test_set_cache.get(db, problem)
+        checker = snapshot.checker
+        test_cases = [
+            {"input": tc["input"], "expected_output": tc["expected_output"], "checker": checker, "source": "visible", "test_case_id": tc["id"]}
+            for tc in snapshot.visible
+        ]
+        if run.include_custom:
+            user_test_cases = db.query(models.UserTestCase).filter(
+                models.UserTestCase.problem_id == run.problem_id,
+                models.UserTestCase.user_id == current_user.id
+            ).all()
+            test_cases += [
+                {"input": tc.input, "expected_output": tc.expected_output, "checker": checker, "source": "custom", "test_case_id": tc.id}
+                for tc in user_test_cases
+            ]
+        return test_cases
+
+    test_cases = await run_db(load_test_cases)
+    if test_cases is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    if not test_cases:
+        raise HTTPException(status_code=400, detail="No visible or custom test cases to run")
 
+    try:
+        results = await judge0_client.execute_code(
+            run.code,
+            test_cases,
+            _additional_files_dict(run.additional_files)
+        )
+    except Exception as e:
+        logger.error(f"Run error for user {current_user.username}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Execution error: {str(e)}")
 
+    # Tag each result with where its test came from
+    for tc, result in zip(test_cases, results):
+        result["source"] = tc["source"]
+        result["test_case_id"] = tc["test_case_id"]
+
+    status, score = score_results(results)
+    return {"problem_id": run.problem_id, "score": score, "status": status, "results": results}
+
 @app.get("/api/submissions/{submission_id}", response_model=schemas.SubmissionResponse)
 def get_submission(
     submission_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    results_offset: int = Query(0, ge=0),
+    results_limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=RESULTS_PAGE_SIZE_MAX),
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    """Full submission with code; per-test results come in pages of results_limit tests"""
     submission = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -390,21 +731,80 @@ def get_submission(
     # Students can only see their own submissions
     if current_user.role != "admin" and submission.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
-    
-    return submission
 
-@app.get("/api/problems/{problem_id}/submissions", response_model=List[schemas.SubmissionResponse])
+    return submission_detail(db, submission, results_offset, results_limit)
+
+@app.get("/api/problems/{problem_id}/submissions", response_model=schemas.SubmissionPage)
 def get_problem_submissions(
     problem_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=PAGE_SIZE_MAX),
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    submissions = db.query(models.Submission).filter(
+    """The user's submission history for a problem, newest first - summaries only"""
+    query = db.query(
+        models.Submission.id,
+        models.Submission.user_id,
+        models.Submission.problem_id,
+        models.Submission.score,
+        models.Submission.status,
+        models.Submission.created_at
+    ).filter(
         models.Submission.problem_id == problem_id,
         models.Submission.user_id == current_user.id
-    ).order_by(models.Submission.created_at.desc()).all()
-    
-    return submissions
+    )
+    try:
+        rows, next_cursor = paginate(query, models.Submission.created_at, models.Submission.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": rows, "next_cursor": next_cursor}
+
+# ==================== Archive Routes ====================
+
+def get_archive_db(term: str):
+    """Read-only session on a term's archive of old submissions (see archive.py)"""
+    try:
+        db = open_archive(term)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Archive not found")
+    try:
+        yield db
+    finally:
+        db.close()
+
+@app.get("/api/admin/archives", response_model=List[str])
+def get_archives(current_user: CurrentUser = Depends(get_current_admin)):
+    return list_archives()
+
+@app.get("/api/admin/archives/{term}/submissions", response_model=schemas.AdminSubmissionPage)
+def get_archived_submissions(
+    term: str,
+    problem_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db: Session = Depends(get_archive_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    return admin_submission_page(db, problem_id, user_id, status_filter, min_score, max_score, cursor, limit)
+
+@app.get("/api/admin/archives/{term}/submissions/{submission_id}", response_model=schemas.SubmissionResponse)
+def get_archived_submission(
+    term: str,
+    submission_id: int,
+    results_offset: int = Query(0, ge=0),
+    results_limit: int = Query(RESULTS_PAGE_SIZE, ge=1, le=RESULTS_PAGE_SIZE_MAX),
+    db: Session = Depends(get_archive_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    submission = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return submission_detail(db, submission, results_offset, results_limit, archive_data_store(term))
 
 # ==================== User Test Cases Routes ====================
 
@@ -412,22 +812,26 @@ def get_problem_submissions(
 def create_user_test_case(
     test_case: schemas.UserTestCaseCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     db_test_case = models.UserTestCase(
         **test_case.dict(),
         user_id=current_user.id
     )
     db.add(db_test_case)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Problem not found")
     db.refresh(db_test_case)
     return db_test_case
 
 @app.get("/api/problems/{problem_id}/user-testcases", response_model=List[schemas.UserTestCaseResponse])
 def get_user_test_cases(
     problem_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     test_cases = db.query(models.UserTestCase).filter(
         models.UserTestCase.problem_id == problem_id,
@@ -439,7 +843,7 @@ def get_user_test_cases(
 def delete_user_test_case(
     testcase_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     test_case = db.query(models.UserTestCase).filter(
         models.UserTestCase.id == testcase_id,
@@ -0,0 +1,504 @@
+"""
+Versioned, resumable migrations for the SQLite database.
+
+Each migration has a version number and runs once; applied versions are
+recorded in schema_migrations. Data migrations walk their table in id order in
+chunks of MIGRATION_CHUNK_SIZE rows (see MigrationContext.batches). Each chunk's
+writes commit together with the migration's cursor in migration_progress, so
+memory use is bounded by one chunk and an interrupted run resumes at the first
+unfinished chunk.
+
+Transactions are one chunk long and the connection waits out locks with
+busy_timeout, so migrations can run while the server is up on a WAL database.
+Exceptions are steps that rewrite a whole table (DROP COLUMN) - they hold the
+write lock while they run and are marked in their docstring.
+
+Add a migration by appending a function decorated with @migration(<next version>).
+Migrations must be idempotent per chunk: a chunk is redone if its commit did not happen.
+
+Usage:
+    python migrations.py status
+    python migrations.py migrate [--yes]
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from archive import backup_database
+from blob_store import blob_hash, compress_text
+from database import SQLITE_BUSY_TIMEOUT_MS, SQLITE_FILE
+from db_types import COMPRESS_THRESHOLD, compress_value, decompress_value
+from gradebook import AGGREGATE_SQL, INSERT_SQL
+from output_compare import output_digest
+from results_store import compact_results, submission_details, test_case_hash
+from testdata_store import test_data_store
+
+MIGRATION_CHUNK_SIZE = int(os.getenv("MIGRATION_CHUNK_SIZE", "500"))  # rows per transaction
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    run: Callable[["MigrationContext"], None]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int):
+    def register(fn: Callable[["MigrationContext"], None]):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, fn.__name__, fn))
+        return fn
+    return register
+
+class MigrationContext:
+    def __init__(self, conn: sqlite3.Connection, version: int, chunk_size: int = MIGRATION_CHUNK_SIZE):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.version = version
+        self.chunk_size = chunk_size
+
+    def columns(self, table: str) -> set:
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        return {col[1] for col in self.cursor.fetchall()}
+
+    def add_column(self, table: str, column: str, column_type: str) -> bool:
+        """ALTER TABLE ADD COLUMN unless the column exists; True if it was added"""
+        if column in self.columns(table):
+            return False
+        self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self.conn.commit()
+        return True
+
+    def _progress(self, step: str) -> int:
+        self.cursor.execute(
+            "SELECT last_id FROM migration_progress WHERE version = ? AND step = ?", (self.version, step)
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def rows(self, table: str, columns: str, where: str = "1", size: Optional[int] = None) -> Iterator[list]:
+        """Read-only pass over a table in id-ordered chunks (not checkpointed)"""
+        last_id = 0
+        while True:
+            self.cursor.execute(
+                f"SELECT id, {columns} FROM {table} WHERE id > ? AND ({where}) ORDER BY id LIMIT ?",
+                (last_id, size or self.chunk_size)
+            )
+            batch = self.cursor.fetchall()
+            if not batch:
+                return
+            last_id = batch[-1][0]
+            yield batch
+
+    def batches(self, table: str, columns: str, where: str = "1", size: Optional[int] = None, step: Optional[str] = None) -> Iterator[list]:
+        """
+        Rows (id first) matching where, in id-ordered chunks, starting after the
+        saved cursor. Write the chunk's changes with self.cursor before asking for the
+        next one: they commit together with the advanced cursor.
+        """
+        step = step or table
+        last_id = self._progress(step)
+        self.cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE id > ? AND ({where})", (last_id,))
+        remaining = self.cursor.fetchone()[0]
+        done = 0
+        while True:
+            self.cursor.execute(
+                f"SELECT id, {columns} FROM {table} WHERE id > ? AND ({where}) ORDER BY id LIMIT ?",
+                (last_id, size or self.chunk_size)
+            )
+            batch = self.cursor.fetchall()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO migration_progress (version, step, last_id, updated_at) VALUES (?, ?, ?, ?)",
+                (self.version, step, last_id, datetime.utcnow().isoformat())
+            )
+            self.conn.commit()
+            done += len(batch)
+            logger.info(f"  ... {step}: {done}/{max(remaining, done)} rows")
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migration_progress (
+            version INTEGER NOT NULL,
+            step VARCHAR(100) NOT NULL,
+            last_id INTEGER NOT NULL,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (version, step)
+        )
+    """)
+    conn.commit()
+    return conn
+
+def applied_versions(conn: sqlite3.Connection) -> Dict[int, str]:
+    return dict(conn.execute("SELECT version, applied_at FROM schema_migrations").fetchall())
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    applied = applied_versions(conn)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version not in applied]
+
+def migrate(conn: sqlite3.Connection, chunk_size: int = MIGRATION_CHUNK_SIZE) -> int:
+    """Apply pending migrations in version order; returns how many were applied"""
+    pending = pending_migrations(conn)
+    for m in pending:
+        logger.info(f"[{m.version}] {m.name}")
+        m.run(MigrationContext(conn, m.version, chunk_size))
+        conn.execute(
+            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+            (m.version, m.name, datetime.utcnow().isoformat())
+        )
+        conn.execute("DELETE FROM migration_progress WHERE version = ?", (m.version,))
+        conn.commit()
+    return len(pending)
+
+# ==================== Migrations ====================
+
+@migration(1)
+def wrap_invalid_results_json(ctx: MigrationContext):
+    """Early databases stored raw error text in submissions.results - wrap it as {"error": ...}"""
+    wrapped = 0
+    for batch in ctx.batches("submissions", "results", "typeof(results) = 'text' AND NOT json_valid(results)"):
+        ctx.cursor.executemany(
+            "UPDATE submissions SET results = ? WHERE id = ?",
+            [(json.dumps({"error": text}), sub_id) for sub_id, text in batch]
+        )
+        wrapped += len(batch)
+    logger.info(f"✓ Wrapped {wrapped} plain-text results")
+
+INDEXES = [
+    ("CREATE INDEX IF NOT EXISTS ix_testcase_problem_hidden ON test_cases(problem_id, is_hidden)", "test_cases compound index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submission_user_problem ON submissions(user_id, problem_id, created_at)", "submissions compound index"),
+    ("CREATE INDEX IF NOT EXISTS ix_usertestcase_user_problem ON user_test_cases(user_id, problem_id)", "user_test_cases compound index"),
+    ("CREATE INDEX IF NOT EXISTS ix_problems_created_at ON problems(created_at)", "problems created_at index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submissions_created_at ON submissions(created_at)", "submissions created_at index"),
+    ("CREATE INDEX IF NOT EXISTS ix_test_cases_problem_id ON test_cases(problem_id)", "test_cases problem_id index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submissions_user_id ON submissions(user_id)", "submissions user_id index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submissions_problem_id ON submissions(problem_id)", "submissions problem_id index"),
+    ("CREATE INDEX IF NOT EXISTS ix_user_test_cases_user_id ON user_test_cases(user_id)", "user_test_cases user_id index"),
+    ("CREATE INDEX IF NOT EXISTS ix_user_test_cases_problem_id ON user_test_cases(problem_id)", "user_test_cases problem_id index"),
+    ("CREATE INDEX IF NOT EXISTS ix_test_cases_is_hidden ON test_cases(is_hidden)", "test_cases is_hidden index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submission_created_id ON submissions(created_at, id)", "submissions keyset index"),
+    ("CREATE INDEX IF NOT EXISTS ix_submission_problem_created ON submissions(problem_id, created_at, id)", "submissions problem keyset index"),
+]
+
+@migration(2)
+def add_indexes(ctx: MigrationContext):
+    for sql, desc in INDEXES:
+        ctx.cursor.execute(sql)
+        ctx.conn.commit()
+        logger.info(f"  ✓ {desc}")
+
+TEST_RESULT_COLUMNS = [
+    "submission_id", "test_case_id", "position", "test_hash", "passed",
+    "status", "time", "memory", "output_digest", "diff", "stderr"
+]
+
+@migration(3)
+def submission_results_table(ctx: MigrationContext):
+    """
+    Convert per-test results stored in submissions.results JSON into compact
+    test_results rows. Entries are matched to test cases by id, or by their
+    input/expected output for results saved before ids were recorded;
+    submissions with unmatched entries keep their JSON results.
+    """
+    ctx.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS test_results (
+            id INTEGER PRIMARY KEY,
+            submission_id INTEGER NOT NULL,
+            test_case_id INTEGER,
+            position INTEGER NOT NULL,
+            test_hash VARCHAR(16),
+            passed BOOLEAN,
+            status VARCHAR(50) NOT NULL,
+            time VARCHAR(20),
+            memory VARCHAR(20),
+            output_digest VARCHAR(64),
+            diff TEXT,
+            stderr TEXT,
+            FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE,
+            FOREIGN KEY (test_case_id) REFERENCES test_cases(id) ON DELETE SET NULL
+        )
+    """)
+    ctx.cursor.execute("CREATE INDEX IF NOT EXISTS ix_test_results_submission_id ON test_results(submission_id)")
+    ctx.cursor.execute("CREATE INDEX IF NOT EXISTS ix_test_results_test_case_id ON test_results(test_case_id)")
+    ctx.conn.commit()
+
+    # (problem_id, content hash) -> test case id, and test case id -> content hash.
+    # Hashes instead of the test data keep this map small.
+    test_case_ids = {}
+    test_case_hashes = {}
+    for batch in ctx.rows("test_cases", "problem_id, input, expected_output", size=100):
+        for tc_id, problem_id, tc_input, tc_expected in batch:
+            content_hash = test_case_hash(decompress_value(tc_input), decompress_value(tc_expected))
+            test_case_ids[(problem_id, content_hash)] = tc_id
+            test_case_hashes[tc_id] = content_hash
+
+    converted = skipped = 0
+    for batch in ctx.batches("submissions", "problem_id, results", "results LIKE '[%'"):
+        for sub_id, problem_id, results_text in batch:
+            results = json.loads(results_text)
+            for r in results:
+                tc_id = r.get("test_case_id")
+                if not tc_id and r.get("input") is not None and r.get("expected_output") is not None:
+                    tc_id = test_case_ids.get((problem_id, test_case_hash(r["input"], r["expected_output"])))
+                r["test_case_id"] = tc_id
+                r.setdefault("test_hash", test_case_hashes.get(tc_id))
+            if any(r["test_case_id"] is None for r in results):
+                skipped += 1
+                continue
+
+            # Redone chunks must not duplicate rows
+            ctx.cursor.execute("DELETE FROM test_results WHERE submission_id = ?", (sub_id,))
+            rows = compact_results(sub_id, results)
+            ctx.cursor.executemany(
+                f"INSERT INTO test_results ({', '.join(TEST_RESULT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in TEST_RESULT_COLUMNS)})",
+                [tuple(row[col] for col in TEST_RESULT_COLUMNS) for row in rows]
+            )
+            details = submission_details(results)
+            ctx.cursor.execute(
+                "UPDATE submissions SET results = ? WHERE id = ?",
+                (json.dumps(details) if details else None, sub_id)
+            )
+            converted += 1
+
+    logger.info(f"✓ Converted {converted} submissions to test_results ({skipped} kept as JSON)")
+
+@migration(4)
+def code_blobs(ctx: MigrationContext):
+    """
+    Move submissions.code into the content-addressed code_blobs table and
+    replace the column with a code_hash reference. Identical sources share a blob.
+    Dropping the old column rewrites the submissions table (holds the write lock).
+    """
+    columns = ctx.columns("submissions")
+    if "code" not in columns:
+        logger.info("✓ Submission code already stored as blobs")
+        return
+
+    ctx.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS code_blobs (
+            hash VARCHAR(64) PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP
+        )
+    """)
+    ctx.conn.commit()
+    ctx.add_column("submissions", "code_hash", "VARCHAR(64) REFERENCES code_blobs(hash)")
+    ctx.add_column("submissions", "files_hash", "VARCHAR(64) REFERENCES code_blobs(hash)")
+
+    migrated = 0
+    for batch in ctx.batches("submissions", "code", "code_hash IS NULL"):
+        hashes = [(sub_id, blob_hash(code), code) for sub_id, code in batch]
+        ctx.cursor.executemany(
+            "INSERT OR IGNORE INTO code_blobs (hash, data, size, created_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+            [(digest, compress_text(code), len(code)) for _, digest, code in hashes]
+        )
+        ctx.cursor.executemany(
+            "UPDATE submissions SET code_hash = ? WHERE id = ?",
+            [(digest, sub_id) for sub_id, digest, _ in hashes]
+        )
+        migrated += len(batch)
+
+    ctx.cursor.execute("CREATE INDEX IF NOT EXISTS ix_submissions_code_hash ON submissions(code_hash)")
+    ctx.cursor.execute("CREATE INDEX IF NOT EXISTS ix_submissions_files_hash ON submissions(files_hash)")
+    # DROP COLUMN needs SQLite 3.35+
+    ctx.cursor.execute("ALTER TABLE submissions DROP COLUMN code")
+    ctx.conn.commit()
+
+    ctx.cursor.execute("SELECT COUNT(*) FROM code_blobs")
+    logger.info(f"✓ Moved code of {migrated} submissions into {ctx.cursor.fetchone()[0]} blobs")
+
+@migration(5)
+def file_backed_test_data(ctx: MigrationContext):
+    """
+    Move test inputs/expected outputs above the file threshold into the test data store.
+    Test hashes of moved tests are taken over the file reference instead of the data,
+    so their stored results (test_results.test_hash) no longer match and run again
+    on the next regrade.
+    """
+    ctx.add_column("test_cases", "input_ref", "VARCHAR(64)")
+    ctx.add_column("test_cases", "expected_ref", "VARCHAR(64)")
+
+    moved = 0
+    for batch in ctx.batches("test_cases", "input, expected_output, input_ref, expected_ref", size=100):
+        for tc_id, tc_input, tc_expected, input_ref, expected_ref in batch:
+            if not input_ref:
+                input_ref, tc_input = test_data_store.store(decompress_value(tc_input))
+            if not expected_ref:
+                expected_ref, tc_expected = test_data_store.store(decompress_value(tc_expected))
+            if input_ref or expected_ref:
+                ctx.cursor.execute(
+                    "UPDATE test_cases SET input = ?, expected_output = ?, input_ref = ?, expected_ref = ? WHERE id = ?",
+                    (compress_value(tc_input), compress_value(tc_expected), input_ref, expected_ref, tc_id)
+                )
+                moved += 1
+
+    logger.info(f"✓ {moved} test cases have file-backed data in {test_data_store.root}")
+
+@migration(6)
+def expected_digests(ctx: MigrationContext):
+    """
+    Fill test_cases.expected_digest for existing rows. Stored data is left as is -
+    the digest is taken over the normalized form, so it matches what new writes store.
+    The digest is not part of test hashes, so this step does not change which
+    stored results a regrade reuses (file_backed_test_data does, for the tests it moves).
+    """
+    ctx.add_column("test_cases", "expected_digest", "VARCHAR(64)")
+
+    filled = 0
+    for batch in ctx.batches("test_cases", "expected_output, expected_ref", "expected_digest IS NULL", size=100):
+        updates = []
+        for tc_id, tc_expected, expected_ref in batch:
+            if expected_ref:
+                with open(test_data_store.path(expected_ref), "rb") as f:
+                    expected = f.read()
+            else:
+                expected = decompress_value(tc_expected)
+            updates.append((output_digest(expected), tc_id))
+        ctx.cursor.executemany("UPDATE test_cases SET expected_digest = ? WHERE id = ?", updates)
+        filled += len(updates)
+
+    logger.info(f"✓ Computed expected-output digests for {filled} test cases")
+
+PROBLEM_COLUMNS = [
+    ("checker", "VARCHAR(20) NOT NULL DEFAULT 'exact'"),
+    ("checker_abs_eps", "FLOAT"),
+    ("checker_rel_eps", "FLOAT"),
+    ("checker_code", "TEXT"),
+    ("test_set_revision", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+@migration(7)
+def problem_checker_columns(ctx: MigrationContext):
+    """Per-problem checker settings and test set revision - existing problems keep the exact checker"""
+    for column, column_type in PROBLEM_COLUMNS:
+        if ctx.add_column("problems", column, column_type):
+            logger.info(f"  ✓ Added problems.{column}")
+
+COMPRESSED_COLUMNS = [
+    ("test_cases", "input"),
+    ("test_cases", "expected_output"),
+    ("submissions", "results"),
+]
+
+@migration(8)
+def compress_large_columns(ctx: MigrationContext):
+    """Compress existing plain-text values that are above the compression threshold"""
+    for table, column in COMPRESSED_COLUMNS:
+        compressed = 0
+        for batch in ctx.batches(
+            table, column,
+            f"typeof({column}) = 'text' AND length(CAST({column} AS BLOB)) >= {int(COMPRESS_THRESHOLD)}",
+            size=200, step=f"{table}.{column}"
+        ):
+            ctx.cursor.executemany(
+                f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                [(compress_value(value), row_id) for row_id, value in batch]
+            )
+            compressed += len(batch)
+        logger.info(f"  ✓ {table}.{column}: {compressed} values compressed")
+
+@migration(9)
+def best_scores_table(ctx: MigrationContext):
+    """Gradebook rows per user and problem (gradebook.py), computed from existing submissions"""
+    ctx.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS best_scores (
+            user_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            best_score FLOAT NOT NULL,
+            attempts INTEGER NOT NULL,
+            first_accepted_at DATETIME,
+            PRIMARY KEY (user_id, problem_id),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (problem_id) REFERENCES problems(id) ON DELETE CASCADE
+        )
+    """)
+    ctx.cursor.execute("CREATE INDEX IF NOT EXISTS ix_best_scores_problem_id ON best_scores(problem_id)")
+    ctx.conn.commit()
+
+    # A chunk of users at a time - each aggregate reads ix_submission_user_problem
+    for batch in ctx.batches("users", "username", size=100):
+        user_ids = [user_id for user_id, _ in batch]
+        placeholders = ", ".join("?" for _ in user_ids)
+        ctx.cursor.execute(f"DELETE FROM best_scores WHERE user_id IN ({placeholders})", user_ids)
+        ctx.cursor.execute(
+            f"{INSERT_SQL} {AGGREGATE_SQL} WHERE user_id IN ({placeholders}) GROUP BY user_id, problem_id", user_ids
+        )
+
+    ctx.cursor.execute("SELECT COUNT(*) FROM best_scores")
+    logger.info(f"✓ Computed {ctx.cursor.fetchone()[0]} best-score rows")
+
+def _print_status(conn: sqlite3.Connection):
+    applied = applied_versions(conn)
+    progress = conn.execute("SELECT version, step, last_id FROM migration_progress").fetchall()
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in applied:
+            print(f"  ✓ [{m.version}] {m.name} (applied {applied[m.version]})")
+        else:
+            steps = ", ".join(f"{step} after id {last_id}" for version, step, last_id in progress if version == m.version)
+            print(f"  • [{m.version}] {m.name} (pending{'; resumes ' + steps if steps else ''})")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = sys.argv[1:]
+    if args not in (["status"], ["migrate"], ["migrate", "--yes"]):
+        print("Usage: python migrations.py status | migrate [--yes]")
+        sys.exit(1)
+    if not SQLITE_FILE or not os.path.exists(SQLITE_FILE):
+        print("Database not found. No migration needed.")
+        print("Run seed.py to create a new database.")
+        sys.exit(0)
+
+    conn = connect(SQLITE_FILE)
+    try:
+        print(f"Database: {SQLITE_FILE}")
+        if args == ["status"]:
+            _print_status(conn)
+            sys.exit(0)
+
+        pending = pending_migrations(conn)
+        if not pending:
+            print("✓ No migration needed - database already up to date")
+            sys.exit(0)
+        print(f"{len(pending)} pending migration(s): {', '.join(m.name for m in pending)}")
+        if args != ["migrate", "--yes"]:
+            response = input("This will modify your database. Continue? (yes/no): ")
+            if response.lower() not in ['yes', 'y']:
+                print("Migration cancelled.")
+                sys.exit(0)
+
+        backup_path = f"{SQLITE_FILE}.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.backup"
+        backup_database(backup_path)
+        print(f"✓ Created backup: {backup_path}")
+
+        try:
+            migrate(conn)
+        except Exception as e:
+            conn.rollback()
+            print(f"\n❌ Migration failed: {e}")
+            print("Completed chunks are kept - run the migration again to resume.")
+            raise
+        print("\n✅ Migration completed successfully!")
+    finally:
+        conn.close()
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, JSON, UniqueConstraint, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, JSON, UniqueConstraint, Index, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
+import zlib
 from database import Base
+from db_types import CompressedText, CompressedJSON
+from output_compare import output_digest
+from testdata_store import test_data_store
+
+# Child rows are removed by ON DELETE CASCADE in the database (foreign keys are
+# enabled on every SQLite connection, see database.py); passive_deletes keeps the
+# ORM from loading whole collections just to delete them row by row.
 
 class User(Base):
     __tablename__ = "users"
@@ -12,8 +20,8 @@ class User(Base):
     role = Column(String(20), nullable=False, default="student")  # admin or student
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    submissions = relationship("Submission", back_populates="user", cascade="all, delete-orphan")
-    user_test_cases = relationship("UserTestCase", back_populates="user", cascade="all, delete-orphan")
+    submissions = relationship("Submission", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    user_test_cases = relationship("UserTestCase", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 class Problem(Base):
     __tablename__ = "problems"
@@ -23,24 +31,51 @@ class Problem(Base):
     description = Column(Text, nullable=False)
     difficulty = Column(String(20), nullable=False)  # easy, medium, hard
     constraints = Column(Text)
+    checker = Column(String(20), nullable=False, default="exact")  # exact, token, float or custom (see checkers.py)
+    checker_abs_eps = Column(Float)  # float checker tolerances
+    checker_rel_eps = Column(Float)
+    checker_code = Column(Text)  # C source of a custom checker
+    test_set_revision = Column(Integer, nullable=False, default=0)  # bumped on test case/checker changes (see snapshot_cache.py)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
-    test_cases = relationship("TestCase", back_populates="problem", cascade="all, delete-orphan")
-    submissions = relationship("Submission", back_populates="problem", cascade="all, delete-orphan")
-    user_test_cases = relationship("UserTestCase", back_populates="problem", cascade="all, delete-orphan")
+    test_cases = relationship("TestCase", back_populates="problem", cascade="all, delete-orphan", passive_deletes=True)
+    submissions = relationship("Submission", back_populates="problem", cascade="all, delete-orphan", passive_deletes=True)
+    user_test_cases = relationship("UserTestCase", back_populates="problem", cascade="all, delete-orphan", passive_deletes=True)
 
 class TestCase(Base):
     __tablename__ = "test_cases"
 
     id = Column(Integer, primary_key=True, index=True)
     problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), nullable=False, index=True)
-    input = Column(Text, nullable=False)
-    expected_output = Column(Text, nullable=False)
+    # Inline data; empty when the value is file-backed (see testdata_store.py)
+    input_inline = Column("input", CompressedText, nullable=False)
+    expected_inline = Column("expected_output", CompressedText, nullable=False)
+    input_ref = Column(String(64))  # sha256 of file-backed input
+    expected_ref = Column(String(64))  # sha256 of file-backed expected output
+    expected_digest = Column(String(64))  # sha256 of the normalized expected output (output_compare.output_digest)
     is_hidden = Column(Boolean, default=False, index=True)
     display_order = Column(Integer, default=0)
 
     problem = relationship("Problem", back_populates="test_cases")
 
+    @property
+    def input(self) -> str:
+        return test_data_store.read(self.input_ref) if self.input_ref else self.input_inline
+
+    @input.setter
+    def input(self, value: str):
+        self.input_ref, self.input_inline = test_data_store.store(value)
+
+    @property
+    def expected_output(self) -> str:
+        return test_data_store.read(self.expected_ref) if self.expected_ref else self.expected_inline
+
+    @expected_output.setter
+    def expected_output(self, value: str):
+        # Stored as written; the digest of its normalized form lets grading compare hashes
+        self.expected_digest = output_digest(value)
+        self.expected_ref, self.expected_inline = test_data_store.store(value)
+
     __table_args__ = (
         Index('ix_testcase_problem_hidden', 'problem_id', 'is_hidden'),
     )
@@ -51,19 +86,72 @@ class Submission(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), nullable=False, index=True)
-    code = Column(Text, nullable=False)
+    code_hash = Column(String(64), ForeignKey("code_blobs.hash"), nullable=False, index=True)  # source code blob
+    files_hash = Column(String(64), ForeignKey("code_blobs.hash"), nullable=True, index=True)  # additional files blob (JSON list)
     score = Column(Float, default=0.0)  # percentage 0-100
     status = Column(String(50), nullable=False)  # completed, compilation_error, error
-    results = Column(JSON)  # JSON with detailed results
+    # Submission-level details (compile output / error); per-test results live in test_results.
+    # Deferred, like the code blob below: list queries never load either.
+    results = deferred(Column(CompressedJSON))
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User", back_populates="submissions")
     problem = relationship("Problem", back_populates="submissions")
+    code_blob = relationship("CodeBlob", foreign_keys=[code_hash])
+    test_results = relationship("TestResult", back_populates="submission", cascade="all, delete-orphan", passive_deletes=True, order_by="TestResult.position")
 
     __table_args__ = (
         Index('ix_submission_user_problem', 'user_id', 'problem_id', 'created_at'),
+        Index('ix_submission_created_id', 'created_at', 'id'),  # keyset pagination of the admin feed
+        Index('ix_submission_problem_created', 'problem_id', 'created_at', 'id'),
     )
 
+    @property
+    def code(self) -> str:
+        return self.code_blob.text
+
+class CodeBlob(Base):
+    """Compressed, content-addressed source text shared by identical submissions"""
+    __tablename__ = "code_blobs"
+
+    hash = Column(String(64), primary_key=True)  # sha256 of the uncompressed text
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed UTF-8
+    size = Column(Integer, nullable=False)  # uncompressed length
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.data).decode()
+
+class TestResult(Base):
+    """Compact per-test outcome of a submission - input/expected output live on TestCase"""
+    __tablename__ = "test_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+    test_case_id = Column(Integer, ForeignKey("test_cases.id", ondelete="SET NULL"), nullable=True, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    test_hash = Column(String(16))  # content hash of the test when it was run
+    passed = Column(Boolean, default=False)
+    status = Column(String(50), nullable=False)
+    time = Column(String(20))
+    memory = Column(String(20))
+    output_digest = Column(String(64))  # sha256 of the normalized actual output
+    diff = Column(Text)  # truncated expected-vs-actual diff, failures only
+    stderr = Column(Text)  # truncated
+
+    submission = relationship("Submission", back_populates="test_results")
+
+class BestScore(Base):
+    """Per user and problem summary of submissions, kept current as they are stored (see gradebook.py)"""
+    __tablename__ = "best_scores"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True, index=True)
+    best_score = Column(Float, nullable=False, default=0.0)
+    attempts = Column(Integer, nullable=False, default=0)
+    first_accepted_at = Column(DateTime)  # first submission with a full score, if any
+
 class UserTestCase(Base):
     __tablename__ = "user_test_cases"
 
@@ -80,3 +168,22 @@ class UserTestCase(Base):
         Index('ix_usertestcase_user_problem', 'user_id', 'problem_id'),
     )
 
+
+class RegradeJob(Base):
+    __tablename__ = "regrade_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), nullable=True, index=True)
+    submission_ids = Column(JSON)  # explicit submission set, or null for every submission of problem_id
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    changed = Column(Integer, default=0)  # submissions whose score or status changed
+    failed = Column(Integer, default=0)  # submissions left untouched after an execution error
+    tests_executed = Column(Integer, default=0)
+    tests_reused = Column(Integer, default=0)  # per-test results carried over unchanged
+    last_submission_id = Column(Integer, default=0)  # resume cursor - submissions are regraded in id order
+    error = Column(Text)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,108 @@
+"""
+Streaming output comparison.
+Works on str, bytes or mmap buffers without splitting them into line lists:
+lines are compared with trailing whitespace removed, and trailing blank lines
+are ignored.
+
+Expected outputs are digested (in normalized form) once when a test case is
+written (TestCase.expected_digest); the stored text stays as the admin wrote it. Grading then only needs one streaming pass over the
+actual output to compute its digest - an accepted answer is a hash comparison.
+"""
+import hashlib
+import mmap
+import re
+from itertools import zip_longest
+from typing import Dict, Iterator, Union
+
+Buffer = Union[str, bytes, bytearray, mmap.mmap]
+
+_TOKEN = re.compile(rb"\S+")
+
+def _as_bytes(data: Buffer):
+    return data.encode() if isinstance(data, str) else data
+
+def iter_lines(data: Buffer) -> Iterator[bytes]:
+    """Yield lines of a buffer with trailing whitespace stripped"""
+    data = _as_bytes(data)
+    start = 0
+    end = len(data)
+    while start < end:
+        stop = data.find(b"\n", start)
+        if stop == -1:
+            stop = end
+        yield data[start:stop].rstrip()
+        start = stop + 1
+
+def iter_normalized_lines(data: Buffer) -> Iterator[bytes]:
+    """iter_lines without trailing blank lines - blank lines are held back until a non-blank line follows"""
+    pending_blank = 0
+    for line in iter_lines(data):
+        if not line:
+            pending_blank += 1
+            continue
+        for _ in range(pending_blank):
+            yield b""
+        pending_blank = 0
+        yield line
+
+def output_digest(data: Buffer) -> str:
+    """sha256 of the normalized output, computed in a single streaming pass"""
+    digest = hashlib.sha256()
+    first = True
+    for line in iter_normalized_lines(data):
+        if not first:
+            digest.update(b"\n")
+        digest.update(line)
+        first = False
+    return digest.hexdigest()
+
+def outputs_equal(actual: Buffer, expected: Buffer) -> bool:
+    """Whitespace-tolerant comparison in a single pass over both buffers"""
+    for actual_line, expected_line in zip_longest(iter_lines(actual), iter_lines(expected)):
+        if actual_line is None or expected_line is None:
+            # One side ended - whatever is left on the other must be blank lines
+            if actual_line or expected_line:
+                return False
+        elif actual_line != expected_line:
+            return False
+    return True
+
+def iter_tokens(data: Buffer) -> Iterator[bytes]:
+    """Whitespace-separated tokens of a buffer, found lazily (re works directly on mmap)"""
+    return (match.group() for match in _TOKEN.finditer(_as_bytes(data)))
+
+def tokens_equal(actual: Buffer, expected: Buffer) -> bool:
+    """Token-wise comparison - spacing and line breaks are irrelevant"""
+    for actual_token, expected_token in zip_longest(iter_tokens(actual), iter_tokens(expected)):
+        if actual_token != expected_token:
+            return False
+    return True
+
+def numbers_close(actual: Buffer, expected: Buffer, abs_eps: float = 0.0, rel_eps: float = 0.0) -> bool:
+    """
+    Token-wise comparison where numeric tokens may differ by abs_eps or by
+    rel_eps relative to the expected value. Non-numeric tokens must match exactly.
+    """
+    for actual_token, expected_token in zip_longest(iter_tokens(actual), iter_tokens(expected)):
+        if actual_token == expected_token:
+            continue
+        if actual_token is None or expected_token is None:
+            return False
+        try:
+            actual_value, expected_value = float(actual_token), float(expected_token)
+        except ValueError:
+            return False
+        error = abs(actual_value - expected_value)
+        if not (error <= abs_eps or error <= rel_eps * abs(expected_value)):
+            return False
+    return True
+
+def output_matches(actual: Buffer, test_case: Dict, expected: Buffer = None) -> bool:
+    """
+    Check actual output against a test case. Uses the precomputed expected_digest
+    when the test case has one, otherwise compares against expected (or the
+    test case's expected_output) directly.
+    """
+    if test_case.get("expected_digest"):
+        return output_digest(actual) == test_case["expected_digest"]
+    return outputs_equal(actual, expected if expected is not None else test_case["expected_output"])
@@ -0,0 +1,43 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+Each page is an index range scan that starts where the previous page ended, so
+page 1000 costs the same as page 1 - unlike OFFSET, which re-reads every skipped row.
+Cursors are opaque to clients: base64 of "<created_at>|<id>" of a page's last row.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for cursors this module did not produce"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def paginate(query: Query, created_column, id_column, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    (rows, next_cursor) for one page of query, newest first. Rows must expose
+    created_at and id. next_cursor is None on the last page.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
@@ -0,0 +1,76 @@
+"""
+bcrypt password hashing.
+A hash costs ~0.25s of CPU at the default cost, so the async login and register
+routes run it in a small process pool instead of the shared threadpool: a class
+logging in at once then queues here without starving grading or problem fetches.
+login_slots caps how many logins wait on the pool at once.
+
+Workers are not forked from the server process, which by then has threads (the
+DB and grading pools) whose locks a forked child could inherit held. They come
+from a forkserver that imports the main module and this one once, so each worker
+starts without importing them again; where forkserver is unavailable (Windows)
+they are spawned and each re-imports the main module.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # log2 of the work factor, 4-31
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+LOGIN_CONCURRENCY = int(os.getenv("LOGIN_CONCURRENCY", "16"))  # logins/registrations in flight
+BULK_HASH_CONCURRENCY = int(os.getenv("BULK_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))  # roster hashes on the pool at once
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS  # $2b$<rounds>$<salt+hash>
+    except (IndexError, ValueError):
+        return True
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def hash_pool() -> ProcessPoolExecutor:
+    """Created on first use so scripts that import this module never start workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["__main__", __name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=context)
+        return _pool
+
+async def get_password_hash_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(hash_pool(), get_password_hash, password, BCRYPT_ROUNDS)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(hash_pool(), verify_password, plain_password, hashed_password)
+
+# Logins beyond the budget wait here rather than piling onto the pool's queue
+login_slots = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+# Bulk hashing (roster imports) keeps at most one round of work queued on the
+# pool, so a login waits behind a few hashes rather than the whole roster
+bulk_hash_slots = asyncio.Semaphore(BULK_HASH_CONCURRENCY)
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    async def hash_one(password: str) -> str:
+        async with bulk_hash_slots:
+            return await get_password_hash_async(password)
+    return await asyncio.gather(*[hash_one(password) for password in passwords])
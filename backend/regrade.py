@@ -0,0 +1,225 @@
+"""
+Bulk regrade of existing submissions after test-case changes.
+Jobs are stored in the regrade_jobs table and walk submissions in id order.
+Each batch is graded in parallel, then its scores and the job cursor are
+committed in one transaction - a job interrupted by a restart resumes from
+the last committed batch.
+Regrades are incremental: only tests added or modified since a submission was
+graded are executed, and the score is recomputed from the merged results.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+from database import ReadSessionLocal, SessionLocal, run_db
+from blob_store import load_files, load_texts
+from gradebook import refresh_best_scores
+from grading import regrade_code
+from result_cache import NON_CACHEABLE_STATUSES
+from results_store import compact_results, load_result_rows, row_to_result, submission_details
+from snapshot_cache import test_set_cache
+
+logger = logging.getLogger(__name__)
+
+REGRADE_CONCURRENCY = int(os.getenv("REGRADE_CONCURRENCY", "8"))  # submissions graded at once
+REGRADE_BATCH_SIZE = int(os.getenv("REGRADE_BATCH_SIZE", "100"))  # submissions per commit
+
+class Regrader:
+    def __init__(self, concurrency: int = REGRADE_CONCURRENCY, batch_size: int = REGRADE_BATCH_SIZE):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def _submission_query(self, db: Session, job: models.RegradeJob):
+        query = db.query(models.Submission)
+        if job.problem_id is not None:
+            query = query.filter(models.Submission.problem_id == job.problem_id)
+        if job.submission_ids is not None:
+            query = query.filter(models.Submission.id.in_(job.submission_ids))
+        return query
+
+    def create_job(self, db: Session, problem_id: Optional[int], submission_ids: Optional[List[int]], user_id: int) -> models.RegradeJob:
+        job = models.RegradeJob(
+            problem_id=problem_id,
+            submission_ids=submission_ids,
+            status="pending",
+            created_by=user_id
+        )
+        job.total = self._submission_query(db, job).count()
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def start(self, job_id: int):
+        """Run a job in the background (no-op if it is already running)"""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    def resume_interrupted(self):
+        """Restart jobs that were still pending or running when the server stopped"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(models.RegradeJob).filter(
+                models.RegradeJob.status.in_(["pending", "running"])
+            ).all()
+            for job in jobs:
+                logger.info(f"Resuming regrade job {job.id} after submission {job.last_submission_id}")
+                self.start(job.id)
+        finally:
+            db.close()
+
+    async def _regrade_one(self, submission, texts: Dict[str, str], previous_results, test_sets: Dict[int, List[Dict]], semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        """Grade one submission; returns an update mapping, or None if it could not be graded"""
+        hidden_test_cases = test_sets[submission.problem_id]
+        if not hidden_test_cases:
+            return None
+        async with semaphore:
+            try:
+                status, score, results, executed = await regrade_code(
+                    submission.problem_id,
+                    hidden_test_cases,
+                    texts[submission.code_hash],
+                    previous_results,
+                    load_files(texts.get(submission.files_hash))
+                )
+            except Exception as e:
+                logger.error(f"Regrade of submission {submission.id} failed: {str(e)}")
+                return None
+        # Executor errors and timeouts may come from load, not the code - keep the stored grade
+        if any(r.get("status") in NON_CACHEABLE_STATUSES for r in results):
+            logger.warning(f"Regrade of submission {submission.id} hit executor errors or timeouts, keeping its grade")
+            return None
+        # Multi-file submissions from before files were stored cannot be rebuilt
+        if status == "compilation_error" and submission.files_hash is None and submission.status == "completed":
+            logger.warning(f"Regrade of submission {submission.id} failed to compile without its additional files, keeping its grade")
+            return None
+        return {"id": submission.id, "score": score, "status": status, "results": results, "executed": executed}
+
+    def _load_batch(self, db: Session, job: models.RegradeJob, test_sets: Dict[int, List[Dict]]):
+        """Next batch after the job cursor, with its previous results and source texts"""
+        batch = self._submission_query(db, job).filter(
+            models.Submission.id > job.last_submission_id
+        ).order_by(models.Submission.id).with_entities(
+            models.Submission.id,
+            models.Submission.user_id,
+            models.Submission.problem_id,
+            models.Submission.code_hash,
+            models.Submission.files_hash,
+            models.Submission.score,
+            models.Submission.status,
+            models.Submission.results
+        ).limit(self.batch_size).all()
+        if not batch:
+            return batch, {}, {}
+
+        for problem_id in {sub.problem_id for sub in batch} - test_sets.keys():
+            snapshot = test_set_cache.get_by_id(db, problem_id)
+            test_sets[problem_id] = list(snapshot.hidden) if snapshot else []
+
+        # Stored per-test rows, or the full JSON results of legacy submissions
+        rows_by_submission = load_result_rows(db, [sub.id for sub in batch])
+        previous_results = {
+            sub.id: [row_to_result(row) for row in rows_by_submission[sub.id]] if sub.id in rows_by_submission else sub.results
+            for sub in batch
+        }
+        texts = load_texts(db, [h for sub in batch for h in (sub.code_hash, sub.files_hash)])
+        return batch, previous_results, texts
+
+    def _save_batch(self, db: Session, job: models.RegradeJob, batch, updates: List[Optional[Dict]], test_sets: Dict[int, List[Dict]]):
+        previous = {sub.id: (sub.score, sub.status) for sub in batch}
+        graded = [u for u in updates if u is not None]
+        db.bulk_update_mappings(models.Submission, [
+            {"id": u["id"], "score": u["score"], "status": u["status"], "results": submission_details(u["results"])}
+            for u in graded
+        ])
+        db.query(models.TestResult).filter(
+            models.TestResult.submission_id.in_([u["id"] for u in graded])
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(models.TestResult, [
+            row for u in graded for row in compact_results(u["id"], u["results"])
+        ])
+
+        # Scores, gradebook rows and cursor commit together so a resumed job never skips or repeats work
+        job.processed += len(batch)
+        job.failed += sum(
+            1 for sub, update in zip(batch, updates)
+            if update is None and test_sets[sub.problem_id]
+        )
+        changed = {u["id"] for u in graded if previous[u["id"]] != (u["score"], u["status"])}
+        refresh_best_scores(db, [(sub.user_id, sub.problem_id) for sub in batch if sub.id in changed])
+        job.changed += len(changed)
+        for u in graded:
+            job.tests_executed += u["executed"]
+            job.tests_reused += len(u["results"]) - u["executed"]
+        job.last_submission_id = batch[-1].id
+        db.commit()
+        logger.info(f"Regrade job {job.id}: {job.processed}/{job.total} submissions")
+
+    def _set_status(self, db: Session, job: models.RegradeJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        db.commit()
+
+    def _complete(self, db: Session, job: models.RegradeJob):
+        self._set_status(db, job, "completed")
+        logger.info(
+            f"Regrade job {job.id} completed: {job.changed} changed, {job.failed} failed, "
+            f"{job.tests_executed} tests executed, {job.tests_reused} reused"
+        )
+
+    def _fail(self, db: Session, job_id: int, error: str):
+        # By id rather than through the loaded row: deleting the job's problem
+        # deletes the job too (ON DELETE CASCADE), and then there is nothing to mark
+        db.rollback()
+        updated = db.query(models.RegradeJob).filter(models.RegradeJob.id == job_id).update(
+            {"status": "failed", "error": error}, synchronize_session=False
+        )
+        db.commit()
+        if not updated:
+            logger.info(f"Regrade job {job_id} was deleted while it ran")
+
+    async def _run(self, job_id: int):
+        # Only grading runs on the event loop; all database work goes to the DB thread pool.
+        # Batches are read on the read pool and the job row is kept loaded across commits,
+        # so the writer connection is only held while a batch's results are saved.
+        db = SessionLocal(expire_on_commit=False)
+        reader = ReadSessionLocal()
+        try:
+            job = await run_db(
+                lambda: db.query(models.RegradeJob).filter(models.RegradeJob.id == job_id).first()
+            )
+            if job is None:
+                return
+            await run_db(self._set_status, db, job, "running")
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            test_sets: Dict[int, List[Dict[str, str]]] = {}
+
+            while True:
+                batch, previous_results, texts = await run_db(self._load_batch, reader, job, test_sets)
+                if not batch:
+                    break
+
+                updates = await asyncio.gather(*[
+                    self._regrade_one(sub, texts, previous_results[sub.id], test_sets, semaphore)
+                    for sub in batch
+                ])
+                await run_db(self._save_batch, db, job, batch, updates, test_sets)
+
+            await run_db(self._complete, db, job)
+        except Exception as e:
+            logger.error(f"Regrade job {job_id} failed: {str(e)}")
+            await run_db(self._fail, db, job_id, str(e))
+        finally:
+            await run_db(db.close)
+            await run_db(reader.close)
+            self._tasks.pop(job_id, None)
+
+# Global regrader instance
+regrader = Regrader()
@@ -0,0 +1,54 @@
+"""
+Cache of serialized read-only API responses with strong ETags.
+Entries are keyed by a version read cheaply from the database (problem revisions,
+see snapshot_cache.py), so a response is rebuilt only after an admin change, in any
+worker process. Admin writes also clear the cache to free stale entries early.
+
+Responses carry "Cache-Control: private, no-cache", so browsers revalidate with
+If-None-Match on every load and get an empty 304 while nothing changed.
+"""
+import hashlib
+import os
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self._cache = TTLCache(max_size=max_size)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+        self._cache.set(key, entry)
+        return entry
+
+    def respond(self, request: Request, entry: CachedResponse) -> Response:
+        """200 with the cached body, or 304 when the client already has this version"""
+        headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        self._cache.clear()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+# Global cache instance
+response_cache = ResponseCache()
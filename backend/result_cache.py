@@ -0,0 +1,122 @@
+"""
+Result memoization for identical resubmissions.
+Code is reduced to a normalized C token stream (comments and layout removed), so
+resubmissions that only differ in whitespace or comments hit the same entry.
+Keys also carry a version hash of the problem's hidden tests - editing a test
+changes the version, so stale results can never be served.
+"""
+import base64
+import copy
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional
+
+from cache import TTLCache
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))  # seconds
+
+# Statuses that may be caused by server load rather than the code itself
+NON_CACHEABLE_STATUSES = {"Time Limit Exceeded", "Error"}
+
+_LINE_SPLICE = re.compile(r"\\\r?\n")
+_C_TOKEN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<newline>\n)
+  | (?P<space>[ \t\r\f\v]+)
+  | (?P<number>\.?\d(?:[eEpP][+-]|[\w.])*)
+  | (?P<word>\w+)
+  | (?P<punct>\.\.\.|<<=|>>=|->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^!=<>]=|\#\#|.)
+''', re.VERBOSE | re.DOTALL)
+
+def normalize_c_source(source: str) -> str:
+    """
+    Reduce C source to its token stream, one space between tokens.
+    Line splices (backslash-newline) are removed first, as in translation phase 2.
+    Newlines are only kept where they end a preprocessor directive, and a macro
+    name stays attached to the "(" of a function-like macro's parameter list.
+    Sources that can observe their own line numbers are returned unchanged.
+    """
+    if "__LINE__" in source or "assert" in source:
+        return source
+
+    tokens = []
+    line_start = True
+    in_directive = False
+    directive = []  # tokens of the current preprocessor directive
+    previous_end = 0
+    source = _LINE_SPLICE.sub("", source)
+    for match in _C_TOKEN.finditer(source):
+        kind = match.lastgroup
+        if kind == "newline":
+            if in_directive:
+                tokens.append("\n")
+                in_directive = False
+            line_start = True
+            continue
+        if kind in ("space", "comment"):
+            continue
+        if line_start and match.group() == "#":
+            in_directive = True
+            directive = []
+        line_start = False
+        if in_directive:
+            directive.append(match.group())
+            # "#define F(x)" is a function-like macro, "#define F (x)" an object-like one
+            if directive[1:2] == ["define"] and len(directive) == 4 and match.group() == "(" and match.start() == previous_end:
+                tokens[-1] += "("
+                previous_end = match.end()
+                continue
+        previous_end = match.end()
+        tokens.append(match.group())
+    return " ".join(tokens)
+
+def _decode_file(content: str) -> str:
+    try:
+        return base64.b64decode(content, validate=True).decode()
+    except Exception:
+        return content
+
+def code_hash(source_code: str, additional_files: Optional[List[Dict[str, str]]] = None) -> str:
+    """Hash of the normalized main source and additional files"""
+    digest = hashlib.sha256(normalize_c_source(source_code).encode())
+    for file_data in sorted(additional_files or [], key=lambda f: f["filename"]):
+        content = _decode_file(file_data["content"])
+        if file_data["filename"].endswith((".c", ".h")):
+            content = normalize_c_source(content)
+        digest.update(b"\0" + file_data["filename"].encode() + b"\0" + content.encode())
+    return digest.hexdigest()
+
+def test_set_version(test_cases: List[Dict]) -> str:
+    """Version hash over the ordered ids and content hashes of a test set"""
+    digest = hashlib.sha256()
+    for tc in test_cases:
+        digest.update(f"{tc['id']}:{tc['hash']}\0".encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def key(self, problem_id: int, version: str, source_code: str,
+            additional_files: Optional[List[Dict[str, str]]] = None) -> tuple:
+        return (problem_id, version, code_hash(source_code, additional_files))
+
+    def get(self, key: tuple) -> Optional[List[Dict]]:
+        results = self._cache.get(key)
+        return copy.deepcopy(results) if results is not None else None
+
+    def put(self, key: tuple, results: List[Dict]):
+        """Store results unless they contain compile errors or load-dependent failures"""
+        if any(r.get("compile_output") or r.get("status") in NON_CACHEABLE_STATUSES for r in results):
+            return
+        self._cache.set(key, copy.deepcopy(results))
+
+    def invalidate_problem(self, problem_id: int):
+        """Free entries of a problem whose tests changed (they can no longer hit anyway)"""
+        self._cache.invalidate(lambda key: key[0] == problem_id)
+
+# Global cache instance
+result_cache = ResultCache()
@@ -0,0 +1,233 @@
+"""
+Compact storage for per-test results.
+Executors return one dict per test that repeats the test's input and expected
+output. Only the outcome is stored (status, time, memory, output digest and a
+truncated diff) in the test_results table; the response shape is rebuilt on read
+by joining back to TestCase.
+"""
+import difflib
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, joinedload
+
+import models
+from checkers import checker_config, checker_fingerprint
+from output_compare import output_digest as normalized_digest
+from testdata_store import TestDataStore, test_data_store
+
+DIFF_LIMIT = 2000  # characters of expected-vs-actual diff kept for failed tests
+STDERR_LIMIT = 2000
+COMPILE_OUTPUT_LIMIT = 10000
+TEST_DATA_PREVIEW_LIMIT = 4000  # characters of file-backed input/output shown for failed tests
+
+def _truncate(text: Optional[str], limit: int) -> Optional[str]:
+    if not text or len(text) <= limit:
+        return text
+    return text[:limit] + "\n... (truncated)"
+
+def _normalized_lines(text: str) -> List[str]:
+    lines = [line.rstrip() for line in text.splitlines()]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+def test_case_hash(input_data: str, expected_output: str) -> str:
+    """Content hash of a test case - changes whenever its input or expected output is edited"""
+    return hashlib.sha256(input_data.encode() + b"\0" + expected_output.encode()).hexdigest()[:16]
+
+def current_test_hash(tc: models.TestCase, checker: Optional[Dict] = None) -> str:
+    """
+    Hash stored with each result of the test (TestResult.test_hash). The checker
+    is folded in, so changing it invalidates cached and reusable results; the
+    default exact checker leaves the hash unchanged.
+    """
+    expected_key = (tc.expected_ref or tc.expected_inline) + checker_fingerprint(checker)
+    return test_case_hash(tc.input_ref or tc.input_inline, expected_key)
+
+def output_digest(text: Optional[str]) -> Optional[str]:
+    """sha256 of output after the same whitespace normalization used for grading"""
+    if text is None:
+        return None
+    return normalized_digest(text)
+
+def output_diff(expected: str, actual: str) -> str:
+    diff = difflib.unified_diff(
+        _normalized_lines(expected),
+        _normalized_lines(actual),
+        "expected",
+        "actual",
+        lineterm="",
+        n=1
+    )
+    return _truncate("\n".join(diff), DIFF_LIMIT)
+
+def compact_results(submission_id: int, results: List[Dict]) -> List[Dict]:
+    """test_results row mappings for a list of executor results"""
+    rows = []
+    for position, r in enumerate(results):
+        passed = bool(r.get("passed", False))
+        failed_with_output = not passed and not r.get("compile_output") and r.get("actual_output") is not None
+        # Results reused by incremental regrades (row_to_result) carry no output - keep what was stored
+        reused = r.get("actual_output") is None
+        rows.append({
+            "submission_id": submission_id,
+            "test_case_id": r.get("test_case_id"),
+            "position": position,
+            "test_hash": r.get("test_hash"),
+            "passed": passed,
+            "status": r.get("status") or "Unknown",
+            "time": str(r["time"]) if r.get("time") is not None else None,
+            "memory": str(r["memory"]) if r.get("memory") is not None else None,
+            "output_digest": r.get("output_digest") if reused else output_digest(r["actual_output"]),
+            "diff": output_diff(r.get("expected_output", ""), r["actual_output"]) if failed_with_output else (r.get("diff") if reused else None),
+            "stderr": _truncate(r.get("stderr") or r.get("error"), STDERR_LIMIT),
+        })
+    return rows
+
+def submission_details(results) -> Optional[Dict]:
+    """Submission-level data kept in Submission.results - compile output or an execution error"""
+    if isinstance(results, dict):
+        return results
+    compile_output = next((r.get("compile_output") for r in results if r.get("compile_output")), None)
+    if compile_output:
+        return {"compile_output": _truncate(compile_output, COMPILE_OUTPUT_LIMIT)}
+    return None
+
+def save_results(db: Session, submission_id: int, results: List[Dict]):
+    """Replace the stored per-test results of a submission (caller commits)"""
+    db.query(models.TestResult).filter(
+        models.TestResult.submission_id == submission_id
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.TestResult, compact_results(submission_id, results))
+
+def row_to_result(row: models.TestResult) -> Dict:
+    """Stored outcome of one test, in the shape incremental regrades merge with"""
+    return {
+        "test_case_id": row.test_case_id,
+        "test_hash": row.test_hash,
+        "passed": row.passed,
+        "status": row.status,
+        "time": row.time,
+        "memory": row.memory,
+        "output_digest": row.output_digest,
+        "diff": row.diff,
+        "stderr": row.stderr,
+        "compile_output": None,
+    }
+
+def load_result_rows(db: Session, submission_ids: Iterable[int]) -> Dict[int, List[models.TestResult]]:
+    """Stored per-test rows of several submissions in one query"""
+    rows_by_submission: Dict[int, List[models.TestResult]] = {}
+    submission_ids = list(submission_ids)
+    if not submission_ids:
+        return rows_by_submission
+    rows = db.query(models.TestResult).filter(
+        models.TestResult.submission_id.in_(submission_ids)
+    ).order_by(models.TestResult.submission_id, models.TestResult.position).all()
+    for row in rows:
+        rows_by_submission.setdefault(row.submission_id, []).append(row)
+    return rows_by_submission
+
+def _test_data_preview(ref: Optional[str], inline: str, store: TestDataStore) -> str:
+    """Inline test data, or the start of a file-backed value"""
+    return store.read_preview(ref, TEST_DATA_PREVIEW_LIMIT) if ref else inline
+
+def rebuild_results(rows: List[models.TestResult], details: Optional[Dict], test_cases: Dict[int, models.TestCase],
+                    store: TestDataStore = test_data_store):
+    """
+    Rebuild the executor result shape from stored rows.
+    Passed tests carry no input/output (the frontend only shows them for failures);
+    failed tests get their test's input and expected output plus the stored diff.
+    A test edited since grading no longer holds the data the result was judged
+    against, so its input/output are left out and the result is marked test_changed.
+    """
+    compile_output = (details or {}).get("compile_output")
+    results = []
+    for row in rows:
+        result = row_to_result(row)
+        tc = test_cases.get(row.test_case_id)
+        failed = not row.passed and tc is not None
+        result["test_changed"] = failed and row.test_hash != current_test_hash(tc, checker_config(tc.problem))
+        show_io = failed and not result["test_changed"]
+        result["input"] = _test_data_preview(tc.input_ref, tc.input_inline, store) if show_io else None
+        result["expected_output"] = _test_data_preview(tc.expected_ref, tc.expected_inline, store) if show_io else None
+        result["actual_output"] = None
+        if row.status == "Compilation Error":
+            result["compile_output"] = compile_output
+        results.append(result)
+    return results
+
+def submission_dict(submission: models.Submission, results, code: Optional[str] = None) -> Dict:
+    """SubmissionResponse fields of a submission with the given results (pass code when the caller has it)"""
+    return {
+        "id": submission.id,
+        "user_id": submission.user_id,
+        "problem_id": submission.problem_id,
+        "code": code if code is not None else submission.code,
+        "score": submission.score,
+        "status": submission.status,
+        "results": results,
+        "created_at": submission.created_at,
+    }
+
+def _failed_test_cases(db: Session, rows: Iterable[models.TestResult]) -> Dict[int, models.TestCase]:
+    """Test cases whose input/expected output are shown - only those of failed tests, with their problem's checker"""
+    test_case_ids = {row.test_case_id for row in rows if row.test_case_id is not None and not row.passed}
+    if not test_case_ids:
+        return {}
+    query = db.query(models.TestCase).options(joinedload(models.TestCase.problem)).filter(models.TestCase.id.in_(test_case_ids))
+    return {tc.id: tc for tc in query}
+
+def submission_dicts(db: Session, submissions: List[models.Submission]) -> List[Dict]:
+    """Submission responses with per-test results rebuilt - two queries for the whole list"""
+    rows_by_submission = load_result_rows(db, [s.id for s in submissions])
+    test_cases = _failed_test_cases(db, (row for rows in rows_by_submission.values() for row in rows))
+
+    response = []
+    for submission in submissions:
+        rows = rows_by_submission.get(submission.id)
+        if rows:
+            results = rebuild_results(rows, submission.results, test_cases)
+        else:
+            # Legacy submission (full results still in the JSON column) or an execution error
+            results = submission.results
+        response.append(submission_dict(submission, results))
+    return response
+
+def submission_detail(db: Session, submission: models.Submission, offset: int = 0, limit: Optional[int] = None,
+                      store: TestDataStore = test_data_store) -> Dict:
+    """
+    Submission response with one page of per-test results (by position) plus
+    results_total/results_passed, so large result sets can be fetched in pages.
+    store holds the file-backed test data (archives have their own).
+    """
+    total, passed = db.query(
+        func.count(models.TestResult.id),
+        func.coalesce(func.sum(case((models.TestResult.passed == True, 1), else_=0)), 0)
+    ).filter(models.TestResult.submission_id == submission.id).one()
+
+    if total:
+        query = db.query(models.TestResult).filter(
+            models.TestResult.submission_id == submission.id,
+            models.TestResult.position >= offset
+        )
+        if limit is not None:
+            query = query.filter(models.TestResult.position < offset + limit)
+        rows = query.order_by(models.TestResult.position).all()
+        results = rebuild_results(rows, submission.results, _failed_test_cases(db, rows), store)
+    elif isinstance(submission.results, list):
+        # Legacy submission with full JSON results
+        total = len(submission.results)
+        passed = sum(1 for r in submission.results if r.get("passed"))
+        results = submission.results[offset:offset + limit if limit is not None else None]
+    else:
+        # Execution error - nothing per test
+        total = passed = None
+        results = submission.results
+
+    response = submission_dict(submission, results)
+    response["results_total"] = total
+    response["results_passed"] = passed
+    return response
@@ -0,0 +1,173 @@
+"""
+Bulk account import from a CSV roster.
+The roster has a header row with username and password columns and an optional
+role column (student or admin, default student). Rows are validated up front -
+any invalid row rejects the whole roster. Usernames repeated within the file
+are reported and only their first row is used; usernames that already have an
+account are reported and skipped unless update_existing is set, in which case
+their password and role are replaced.
+
+bcrypt dominates the cost, so passwords are hashed in parallel on the
+passwords.py process pool, and only for the rows that will be written. All
+users are then inserted or updated in a single transaction.
+
+Usage: python roster.py import <roster.csv> [--update]
+"""
+import csv
+import io
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from auth import invalidate_user
+from passwords import BCRYPT_ROUNDS, get_password_hash, hash_pool
+
+ROLES = ("student", "admin")
+ROSTER_MAX_ROWS = 5000
+EXISTING_QUERY_CHUNK = 500  # usernames per IN (...) lookup
+
+class RosterError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+@dataclass
+class RosterRow:
+    line: int
+    username: str
+    password: str
+    role: str
+
+@dataclass
+class RosterPlan:
+    """What an import will do, decided before any password is hashed"""
+    create: List[RosterRow] = field(default_factory=list)
+    update: List[RosterRow] = field(default_factory=list)
+    existing: List[str] = field(default_factory=list)  # skipped, already have an account
+    duplicates: List[str] = field(default_factory=list)  # repeated within the roster
+
+def parse_roster(text: str) -> Tuple[List[RosterRow], List[str]]:
+    """(rows, duplicate usernames) - raises RosterError listing every invalid row"""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    header = {name.strip().lower() for name in reader.fieldnames or []}
+    if not {"username", "password"} <= header:
+        raise RosterError(["Roster needs a header row with username and password columns"])
+
+    rows: List[RosterRow] = []
+    seen = set()
+    duplicates: List[str] = []
+    errors: List[str] = []
+    for record in reader:
+        record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        line = reader.line_num
+        username, password = record.get("username", ""), record.get("password", "")
+        role = record.get("role") or "student"
+        if not username and not password:
+            continue  # blank line
+        if len(username) < 3 or len(username) > 50:
+            errors.append(f"Line {line}: username must be between 3 and 50 characters")
+        elif len(password) < 6:
+            errors.append(f"Line {line}: password must be at least 6 characters")
+        elif role not in ROLES:
+            errors.append(f"Line {line}: role must be one of {', '.join(ROLES)}")
+        elif username in seen:
+            duplicates.append(username)
+        else:
+            seen.add(username)
+            rows.append(RosterRow(line, username, password, role))
+        if len(rows) > ROSTER_MAX_ROWS:
+            raise RosterError([f"Roster has more than {ROSTER_MAX_ROWS} rows"])
+    if errors:
+        raise RosterError(errors)
+    return rows, duplicates
+
+def plan_import(db: Session, rows: List[RosterRow], duplicates: List[str], update_existing: bool) -> RosterPlan:
+    usernames = [row.username for row in rows]
+    existing = set()
+    for start in range(0, len(usernames), EXISTING_QUERY_CHUNK):
+        existing.update(
+            username for (username,) in db.query(models.User.username).filter(
+                models.User.username.in_(usernames[start:start + EXISTING_QUERY_CHUNK])
+            )
+        )
+
+    plan = RosterPlan(duplicates=duplicates)
+    for row in rows:
+        if row.username not in existing:
+            plan.create.append(row)
+        elif update_existing:
+            plan.update.append(row)
+        else:
+            plan.existing.append(row.username)
+    return plan
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash on every pool worker at once (blocking - for the CLI)"""
+    return list(hash_pool().map(get_password_hash, passwords, [BCRYPT_ROUNDS] * len(passwords)))
+
+def apply_import(db: Session, plan: RosterPlan, hashes: Dict[str, str]):
+    """Insert and update the planned users in one transaction; hashes maps username to password hash"""
+    try:
+        db.bulk_insert_mappings(models.User, [
+            {"username": row.username, "password_hash": hashes[row.username], "role": row.role}
+            for row in plan.create
+        ])
+        ids = dict(db.query(models.User.username, models.User.id).filter(
+            models.User.username.in_([row.username for row in plan.update])
+        )) if plan.update else {}
+        db.bulk_update_mappings(models.User, [
+            {"id": ids[row.username], "password_hash": hashes[row.username], "role": row.role}
+            for row in plan.update
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    # Bulk updates skip the ORM events that keep the auth user cache current
+    for row in plan.update:
+        invalidate_user(row.username)
+
+def import_report(plan: RosterPlan) -> dict:
+    return {
+        "created": len(plan.create),
+        "updated": len(plan.update),
+        "existing": plan.existing,
+        "duplicates": plan.duplicates
+    }
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    args = sys.argv[1:]
+    if len(args) not in (2, 3) or args[0] != "import" or args[2:] not in ([], ["--update"]):
+        print("Usage: python roster.py import <roster.csv> [--update]")
+        sys.exit(1)
+
+    with open(args[1], encoding="utf-8") as f:
+        try:
+            rows, duplicates = parse_roster(f.read())
+        except RosterError as e:
+            for error in e.errors:
+                print(f"❌ {error}")
+            sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        plan = plan_import(db, rows, duplicates, update_existing=args[2:] == ["--update"])
+        to_hash = plan.create + plan.update
+        print(f"Hashing {len(to_hash)} passwords...")
+        hashes = dict(zip((row.username for row in to_hash), hash_passwords([row.password for row in to_hash])))
+        apply_import(db, plan, hashes)
+    finally:
+        db.close()
+
+    report = import_report(plan)
+    print(f"✓ Created {report['created']} users, updated {report['updated']}")
+    if plan.existing:
+        print(f"⚠️  Skipped {len(plan.existing)} existing users (use --update to replace): {', '.join(plan.existing)}")
+    if plan.duplicates:
+        print(f"⚠️  Ignored repeated rows for: {', '.join(plan.duplicates)}")
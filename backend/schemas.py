@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Literal
 from datetime import datetime
 
 # Auth Schemas
@@ -28,6 +28,12 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RosterImportResponse(BaseModel):
+    created: int
+    updated: int
+    existing: List[str]  # usernames skipped because the account exists
+    duplicates: List[str]  # usernames repeated within the roster
+
 # Problem Schemas
 class TestCaseBase(BaseModel):
     input: str
@@ -60,13 +66,19 @@ class ProblemBase(BaseModel):
     difficulty: str
     constraints: Optional[str] = None
 
-class ProblemCreate(ProblemBase):
+class CheckerSettings(BaseModel):
+    checker: Literal["exact", "token", "float", "custom"] = "exact"
+    checker_abs_eps: Optional[float] = None  # float checker: allowed absolute error
+    checker_rel_eps: Optional[float] = None  # float checker: allowed relative error
+    checker_code: Optional[str] = None  # custom checker: C source, run as checker <input> <expected> <actual>
+
+class ProblemCreate(ProblemBase, CheckerSettings):
     pass
 
-class ProblemUpdate(ProblemBase):
+class ProblemUpdate(ProblemBase, CheckerSettings):
     pass
 
-class ProblemResponse(ProblemBase):
+class ProblemResponse(ProblemBase, CheckerSettings):
     id: int
     created_at: datetime
     test_cases: List[TestCaseResponse] = []
@@ -74,6 +86,20 @@ class ProblemResponse(ProblemBase):
     class Config:
         from_attributes = True
 
+class ProblemSummary(BaseModel):
+    """Problem list entry - the full description and tests come from /api/problems/{id}"""
+    id: int
+    title: str
+    difficulty: str
+    created_at: datetime
+    description_preview: str
+    visible_test_count: int
+
+class ProblemAdminSummary(ProblemSummary):
+    checker: str
+    test_case_count: int
+    hidden_test_count: int
+
 class ProblemPublic(ProblemBase):
     id: int
     created_at: datetime
@@ -92,6 +118,18 @@ class SubmissionCreate(BaseModel):
     code: str
     additional_files: Optional[List[AdditionalFile]] = None  # For multi-file programs (ADT, headers, etc.)
 
+class RunRequest(BaseModel):
+    problem_id: int
+    code: str
+    additional_files: Optional[List[AdditionalFile]] = None
+    include_custom: bool = True  # Also run the user's saved custom test cases
+
+class RunResponse(BaseModel):
+    problem_id: int
+    score: float
+    status: str  # completed, compilation_error
+    results: List[Dict[str, Any]] = []
+
 class SubmissionResponse(BaseModel):
     id: int
     user_id: int
@@ -100,11 +138,50 @@ class SubmissionResponse(BaseModel):
     score: float
     status: str
     results: Optional[Any] = None  # Can be dict/list (JSON) or string (for backward compatibility)
+    results_total: Optional[int] = None  # number of per-test results when results is one page of them
+    results_passed: Optional[int] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class SubmissionSummary(BaseModel):
+    """Submission list entry - code and per-test results come from /api/submissions/{id}"""
+    id: int
+    user_id: int
+    problem_id: int
+    score: float
+    status: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AdminSubmissionSummary(SubmissionSummary):
+    username: str
+    problem_title: str
+
+class SubmissionPage(BaseModel):
+    items: List[SubmissionSummary]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next (older) page
+
+class AdminSubmissionPage(BaseModel):
+    items: List[AdminSubmissionSummary]
+    next_cursor: Optional[str] = None
+
+class GradebookEntry(BaseModel):
+    """Best submission of a user for a problem (see gradebook.py)"""
+    user_id: int
+    username: str
+    problem_id: int
+    problem_title: str
+    best_score: float
+    attempts: int
+    first_accepted_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # User Test Case Schemas
 class UserTestCaseCreate(BaseModel):
     problem_id: int
@@ -121,3 +198,25 @@ class UserTestCaseResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+# Regrade Schemas
+class RegradeRequest(BaseModel):
+    problem_id: Optional[int] = None
+    submission_ids: Optional[List[int]] = None  # Regrade only these (optionally within problem_id)
+
+class RegradeJobResponse(BaseModel):
+    id: int
+    problem_id: Optional[int] = None
+    status: str
+    total: int
+    processed: int
+    changed: int
+    failed: int
+    tests_executed: int = 0
+    tests_reused: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,104 @@
+"""
+In-process snapshots of each problem's test sets.
+A snapshot holds the hidden tests (as executor input) and the visible tests shown
+to students, frozen so it can be shared between concurrent requests. Snapshots
+are tagged with Problem.test_set_revision, which the admin problem and test-case
+endpoints bump on every change: a request that already loaded the problem row
+can tell whether its snapshot is current without touching test_cases, and other
+worker processes pick up edits on their next request.
+
+snapshot.version hashes the hidden tests' ids, contents and checker - the same
+value the result cache keys on - so callers can tell when stored results are stale.
+"""
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from cache import TTLCache
+from checkers import checker_config
+from grading import executor_test_case
+from result_cache import test_set_version
+
+VISIBLE_TEST_CASE_LIMIT = 3  # Only the first few non-hidden tests are shown to students
+TEST_SET_CACHE_SIZE = int(os.getenv("TEST_SET_CACHE_SIZE", "512"))  # problems
+
+@dataclass(frozen=True)
+class TestSetSnapshot:
+    problem_id: int
+    revision: int
+    version: str
+    hidden: Tuple[Mapping, ...]  # executor test cases, ordered by id
+    visible: Tuple[Mapping, ...]  # id, input, expected_output, display_order
+    checker: Optional[Mapping]
+
+def _freeze(value: Optional[dict]) -> Optional[Mapping]:
+    return MappingProxyType(value) if value is not None else None
+
+def load_snapshot(db: Session, problem: models.Problem) -> TestSetSnapshot:
+    """Build a snapshot from the database with a single test_cases query"""
+    checker = checker_config(problem)
+    test_cases = db.query(models.TestCase).filter(
+        models.TestCase.problem_id == problem.id
+    ).order_by(models.TestCase.id).all()
+
+    hidden = []
+    for tc in test_cases:
+        if tc.is_hidden:
+            case = executor_test_case(tc, checker)
+            case["checker"] = _freeze(case["checker"])
+            hidden.append(MappingProxyType(case))
+    visible = sorted(
+        (tc for tc in test_cases if not tc.is_hidden),
+        key=lambda tc: tc.display_order if tc.display_order is not None else 0
+    )[:VISIBLE_TEST_CASE_LIMIT]
+
+    return TestSetSnapshot(
+        problem_id=problem.id,
+        revision=problem.test_set_revision or 0,
+        version=test_set_version(hidden),
+        hidden=tuple(hidden),
+        visible=tuple(
+            MappingProxyType({
+                "id": tc.id,
+                "input": tc.input,
+                "expected_output": tc.expected_output,
+                "display_order": tc.display_order
+            })
+            for tc in visible
+        ),
+        checker=_freeze(checker)
+    )
+
+class TestSetCache:
+    def __init__(self, max_size: int = TEST_SET_CACHE_SIZE):
+        self._cache = TTLCache(max_size=max_size)
+
+    def get(self, db: Session, problem: models.Problem) -> TestSetSnapshot:
+        """Snapshot for an already loaded problem row - reloaded when the revision moved on"""
+        snapshot = self._cache.get(problem.id)
+        if snapshot is not None and snapshot.revision == (problem.test_set_revision or 0):
+            return snapshot
+        snapshot = load_snapshot(db, problem)
+        self._cache.set(problem.id, snapshot)
+        return snapshot
+
+    def get_by_id(self, db: Session, problem_id: int) -> Optional[TestSetSnapshot]:
+        problem = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
+        return self.get(db, problem) if problem else None
+
+    def invalidate(self, problem_id: int):
+        self._cache.pop(problem_id)
+
+def bump_revision(db: Session, problem: models.Problem):
+    """Mark a problem's test sets (or checker) as changed - call before committing the change"""
+    # Incremented in SQL, so concurrent edits of one problem each get their own revision
+    problem.test_set_revision = models.Problem.test_set_revision + 1
+    db.flush()
+    db.refresh(problem, ["test_set_revision"])
+
+# Global cache instance
+test_set_cache = TestSetCache()
@@ -0,0 +1,147 @@
+"""
+Group commit for new submissions.
+Committing each graded submission on its own costs one SQLite fsync per
+submission, and all of them queue on the single writer lock. Submit requests
+hand their finished submission to the writer instead; it collects whatever
+arrives within GROUP_COMMIT_DELAY_MS of the first (or until
+GROUP_COMMIT_MAX_BATCH) and writes code blobs, submission rows, per-test
+results and gradebook updates for the whole group in one transaction.
+Submissions arriving while a commit runs form the next group, so the batch
+size grows with load.
+
+write() only returns once the group's commit is done, so a client never sees
+a status that is not yet durable. If a group fails, its submissions are retried
+one by one so a single bad row cannot fail the others.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+import models
+from blob_store import put_blob, put_files
+from database import SessionLocal, run_db
+from gradebook import record_submission
+from results_store import save_results, submission_details
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT_DELAY_MS = float(os.getenv("GROUP_COMMIT_DELAY_MS", "5"))  # max wait for more submissions
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))  # submissions per commit
+
+@dataclass
+class NewSubmission:
+    user_id: int
+    problem_id: int
+    code: str
+    additional_files: Optional[List[Dict[str, str]]]
+    status: str
+    score: float
+    results: Union[List[Dict], Dict]  # executor results, or {"error": ...} for an execution error
+
+def _add_submission(db: Session, submission: NewSubmission) -> models.Submission:
+    """Stage one submission with its blobs and per-test results (caller commits)"""
+    has_results = isinstance(submission.results, list)
+    db_submission = models.Submission(
+        user_id=submission.user_id,
+        problem_id=submission.problem_id,
+        code_hash=put_blob(db, submission.code),
+        files_hash=put_files(db, submission.additional_files),
+        score=submission.score,
+        status=submission.status,
+        results=submission_details(submission.results) if has_results else submission.results
+    )
+    db.add(db_submission)
+    db.flush()
+    if has_results:
+        save_results(db, db_submission.id, submission.results)
+    record_submission(db, db_submission)
+    return db_submission
+
+def commit_submissions(submissions: List[NewSubmission]) -> List[Union[models.Submission, Exception]]:
+    """
+    Store submissions in one transaction. Returns the stored rows (detached, with
+    id and created_at loaded), or the exception for each submission that failed.
+    """
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        try:
+            rows = [_add_submission(db, submission) for submission in submissions]
+            db.commit()
+            return rows
+        except Exception as e:
+            db.rollback()
+            if len(submissions) == 1:
+                return [e]
+            logger.warning(f"Group commit of {len(submissions)} submissions failed, retrying one by one: {str(e)}")
+
+        outcomes: List[Union[models.Submission, Exception]] = []
+        for submission in submissions:
+            try:
+                row = _add_submission(db, submission)
+                db.commit()
+                db.expunge(row)  # a later rollback would expire it
+                outcomes.append(row)
+            except Exception as e:
+                db.rollback()
+                outcomes.append(e)
+        return outcomes
+    finally:
+        db.close()
+
+class SubmissionWriter:
+    def __init__(self, max_delay_ms: float = GROUP_COMMIT_DELAY_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.written = 0
+
+    async def write(self, submission: NewSubmission) -> models.Submission:
+        """Queue a submission and wait until the commit that stores it is done"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(self._queue))
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((submission, future))
+        return await future
+
+    async def _next_group(self, queue: asyncio.Queue) -> list:
+        group = [await queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(group) < self.max_batch:
+            if not queue.empty():
+                group.append(queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                group.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return group
+
+    async def _run(self, queue: asyncio.Queue):
+        while True:
+            group = await self._next_group(queue)
+            try:
+                outcomes = await run_db(commit_submissions, [submission for submission, _ in group])
+            except Exception as e:
+                outcomes = [e] * len(group)
+            self.commits += 1
+            self.written += sum(1 for outcome in outcomes if not isinstance(outcome, Exception))
+            for (_, future), outcome in zip(group, outcomes):
+                if future.done():  # the request was cancelled
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+# Global writer instance
+submission_writer = SubmissionWriter()
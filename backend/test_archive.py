@@ -0,0 +1,220 @@
+"""
+Per-term archives (archive.py) on a temporary SQLite file
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import archive
+import gradebook
+import models
+import results_store
+import submission_writer
+from database import SessionLocal
+from test_group_commit import new_submission
+from testdata_store import test_data_store
+
+CUTOFF = datetime(2021, 1, 1)
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    """Archives of each test in their own directory, opened with fresh engines"""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "_archive_engines", {})
+
+@pytest.fixture
+def term_data(seeded):
+    """Old and current submissions of two students; returns (user_ids, problem_ids)"""
+    (alice, bob), (p1, p2) = seeded
+    old = submission_writer.commit_submissions([
+        new_submission(alice, p1, 100.0), new_submission(alice, p2, 80.0), new_submission(bob, p1, 100.0)
+    ])
+    submission_writer.commit_submissions([new_submission(alice, p1, 50.0), new_submission(bob, p1, 30.0)])
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            text(f"UPDATE submissions SET created_at = '2020-06-01 12:00:00' WHERE id IN ({', '.join(str(s.id) for s in old)})")
+        )
+        db.commit()
+        gradebook.rebuild_best_scores(db)
+    finally:
+        db.close()
+    return (alice, bob), (p1, p2)
+
+def backdate_all_submissions():
+    db = SessionLocal()
+    try:
+        db.execute(text("UPDATE submissions SET created_at = '2020-06-01 12:00:00'"))
+        db.commit()
+    finally:
+        db.close()
+
+def backdate_submission(submission_id):
+    db = SessionLocal()
+    try:
+        db.execute(text("UPDATE submissions SET created_at = '2020-06-01 12:00:00' WHERE id = :id"), {"id": submission_id})
+        db.commit()
+    finally:
+        db.close()
+
+def best_scores():
+    db = SessionLocal()
+    try:
+        return {(b.user_id, b.problem_id): (b.best_score, b.attempts, b.first_accepted_at) for b in db.query(models.BestScore)}
+    finally:
+        db.close()
+
+def load_hot_submission(submission_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.Submission, submission_id)
+    finally:
+        db.close()
+
+def hot_submission_count():
+    db = SessionLocal()
+    try:
+        return db.query(models.Submission).count()
+    finally:
+        db.close()
+
+def archived_counts(term):
+    db = archive.open_archive(term)
+    try:
+        return db.query(models.Submission).count(), db.query(models.TestResult).count()
+    finally:
+        db.close()
+
+def test_archive_moves_old_submissions_and_updates_best_scores(term_data):
+    (alice, bob), (p1, p2) = term_data
+
+    assert archive.archive_submissions("spring-2020", CUTOFF, chunk_size=2) == 3
+
+    assert hot_submission_count() == 2
+    assert archived_counts("spring-2020") == (3, 3)
+    # The gradebook covers the hot submissions only - the same as a full rebuild
+    assert best_scores() == {(alice, p1): (50.0, 1, None), (bob, p1): (30.0, 1, None)}
+    db = SessionLocal()
+    try:
+        gradebook.rebuild_best_scores(db)
+    finally:
+        db.close()
+    assert best_scores() == {(alice, p1): (50.0, 1, None), (bob, p1): (30.0, 1, None)}
+
+    db = archive.open_archive("spring-2020")
+    try:
+        assert {u.password_hash for u in db.query(models.User)} == {""}
+    finally:
+        db.close()
+
+class InterruptedConnection:
+    """sqlite3 connection that fails where archive_submissions deletes the copied hot rows"""
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        if sql.startswith("DELETE FROM main.submissions"):
+            raise sqlite3.OperationalError("interrupted")
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def test_interrupted_archive_rerun_does_not_duplicate(term_data, monkeypatch):
+    (alice, bob), (p1, p2) = term_data
+    connect = archive._connect
+    monkeypatch.setattr(archive, "_connect", lambda path: InterruptedConnection(connect(path)))
+    with pytest.raises(sqlite3.OperationalError):
+        archive.archive_submissions("fall-2020", CUTOFF, chunk_size=2)
+    # The first chunk was copied, but is still in the hot database
+    assert hot_submission_count() == 5
+    assert archived_counts("fall-2020") == (2, 2)
+
+    monkeypatch.setattr(archive, "_connect", connect)
+    assert archive.archive_submissions("fall-2020", CUTOFF, chunk_size=2) == 3
+    assert hot_submission_count() == 2
+    assert archived_counts("fall-2020") == (3, 3)
+    assert best_scores() == {(alice, p1): (50.0, 1, None), (bob, p1): (30.0, 1, None)}
+
+def test_archived_results_keep_file_backed_test_data(seeded, monkeypatch):
+    monkeypatch.setattr(test_data_store, "threshold", 1)  # every test is file-backed
+    (alice, _), (problem_id, _) = seeded
+    db = SessionLocal()
+    try:
+        tc = models.TestCase(problem_id=problem_id, is_hidden=True)
+        tc.input = "1 2"
+        tc.expected_output = "3"
+        db.add(tc)
+        db.commit()
+        test_case_id, test_hash = tc.id, results_store.current_test_hash(tc)
+    finally:
+        db.close()
+    submission_writer.commit_submissions([submission_writer.NewSubmission(
+        alice, problem_id, "int main(){return 0;}", None, "completed", 0.0,
+        [{"test_case_id": test_case_id, "test_hash": test_hash, "passed": False, "status": "Wrong Answer",
+          "expected_output": "3", "actual_output": "4"}]
+    )])
+    backdate_all_submissions()
+
+    assert archive.archive_submissions("spring-2020", CUTOFF) == 1
+    # The hot test and its files go away
+    db = SessionLocal()
+    try:
+        db.query(models.TestCase).delete()
+        db.commit()
+    finally:
+        db.close()
+    test_data_store.collect_garbage(set())
+
+    db = archive.open_archive("spring-2020")
+    try:
+        submission = db.query(models.Submission).one()
+        detail = results_store.submission_detail(db, submission, store=archive.archive_data_store("spring-2020"))
+    finally:
+        db.close()
+    [result] = detail["results"]
+    assert (result["input"], result["expected_output"], result["test_changed"]) == ("1 2", "3", False)
+
+def test_reused_usernames_are_kept_apart(seeded):
+    (alice, bob), (problem_id, _) = seeded
+    submission_writer.commit_submissions([new_submission(alice, problem_id)])
+    backdate_all_submissions()
+    submission_writer.commit_submissions([new_submission(alice, problem_id)])  # stays, so ids are not reused
+    archive.archive_submissions("spring-2020", CUTOFF)
+
+    # alice is renamed and bob takes over her old username
+    db = SessionLocal()
+    try:
+        db.get(models.User, alice).username = "alice"
+        db.flush()
+        db.get(models.User, bob).username = "student0"
+        db.commit()
+    finally:
+        db.close()
+    [new] = submission_writer.commit_submissions([new_submission(bob, problem_id)])
+    backdate_submission(new.id)
+
+    assert archive.archive_submissions("spring-2020", CUTOFF) == 1
+    db = archive.open_archive("spring-2020")
+    try:
+        assert {u.id: u.username for u in db.query(models.User)} == {alice: "student0", bob: f"student0 (#{bob})"}
+        assert db.query(models.Submission).count() == 2
+    finally:
+        db.close()
+
+def test_reused_submission_ids_are_not_skipped(seeded):
+    (alice, bob), (problem_id, _) = seeded
+    submission_writer.commit_submissions([new_submission(alice, problem_id)])
+    backdate_all_submissions()
+    archive.archive_submissions("spring-2020", CUTOFF)
+    # The hot table is empty, so SQLite hands out the archived submission's id again
+    [reused] = submission_writer.commit_submissions([new_submission(bob, problem_id)])
+    backdate_all_submissions()
+
+    with pytest.raises(ValueError, match="other submissions"):
+        archive.archive_submissions("spring-2020", CUTOFF)
+    assert load_hot_submission(reused.id) is not None
+    assert archive.archive_submissions("fall-2020", CUTOFF) == 1
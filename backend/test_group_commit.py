@@ -0,0 +1,73 @@
+"""
+Group commit of submissions (submission_writer.py) on a temporary SQLite file
+"""
+import asyncio
+
+import models
+import submission_writer
+from database import SessionLocal
+
+def new_submission(user_id, problem_id, score=100.0):
+    passed = score >= 100.0
+    return submission_writer.NewSubmission(
+        user_id=user_id,
+        problem_id=problem_id,
+        code=f"int main(){{return {int(score)};}}",
+        additional_files=None,
+        status="completed",
+        score=score,
+        results=[{
+            "test_case_id": None, "test_hash": "0" * 16, "passed": passed, "status": "Accepted" if passed else "Wrong Answer",
+            "time": "0.01", "memory": "100", "expected_output": "3", "actual_output": "3" if passed else "4"
+        }]
+    )
+
+def stored_counts():
+    db = SessionLocal()
+    try:
+        return (
+            db.query(models.Submission).count(),
+            db.query(models.TestResult).count(),
+            {(b.user_id, b.problem_id): (b.best_score, b.attempts) for b in db.query(models.BestScore)}
+        )
+    finally:
+        db.close()
+
+def test_failed_group_keeps_good_rows(seeded):
+    (alice, bob), (p1, _) = seeded
+    outcomes = submission_writer.commit_submissions([
+        new_submission(alice, p1, 50.0),
+        new_submission(bob, 999999),  # unknown problem - violates the foreign key
+        new_submission(alice, p1, 100.0),
+    ])
+
+    assert isinstance(outcomes[0], models.Submission)
+    assert isinstance(outcomes[1], Exception)
+    assert isinstance(outcomes[2], models.Submission)
+    # Rows stored before the failure stay readable for their requests
+    assert outcomes[0].id and outcomes[0].created_at
+    submissions, results, best = stored_counts()
+    assert submissions == 2
+    assert results == 2
+    assert best == {(alice, p1): (100.0, 2)}
+
+def test_writer_groups_concurrent_submissions(seeded):
+    (alice, bob), (p1, p2) = seeded
+    writer = submission_writer.SubmissionWriter(max_delay_ms=50)
+
+    async def write_all():
+        return await asyncio.gather(*[
+            writer.write(new_submission(user_id, problem_id))
+            for user_id in (alice, bob) for problem_id in (p1, p2)
+        ] + [writer.write(new_submission(bob, 999999))], return_exceptions=True)
+
+    outcomes = asyncio.run(write_all())
+
+    assert [isinstance(o, Exception) for o in outcomes] == [False] * 4 + [True]
+    assert len({o.id for o in outcomes[:4]}) == 4
+    assert writer.commits == 1
+    assert writer.written == 4
+    submissions, results, best = stored_counts()
+    assert submissions == 4
+    assert results == 4
+    assert set(best.values()) == {(100.0, 1)}
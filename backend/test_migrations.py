@@ -0,0 +1,202 @@
+"""
+Resumable migrations (migrations.py) on a temporary SQLite file holding a database
+created by the first release, upgraded to the current models
+"""
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+import migrations
+import models
+import results_store
+from database import Base
+from testdata_store import test_data_store
+
+# Schema that Base.metadata.create_all produced with the first release's models.py
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    password_hash VARCHAR NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE TABLE problems (
+    id INTEGER NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    description TEXT NOT NULL,
+    difficulty VARCHAR(20) NOT NULL,
+    constraints TEXT,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (title)
+);
+CREATE INDEX ix_problems_created_at ON problems (created_at);
+CREATE INDEX ix_problems_id ON problems (id);
+CREATE TABLE test_cases (
+    id INTEGER NOT NULL,
+    problem_id INTEGER NOT NULL,
+    input TEXT NOT NULL,
+    expected_output TEXT NOT NULL,
+    is_hidden BOOLEAN,
+    display_order INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(problem_id) REFERENCES problems (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_test_cases_problem_id ON test_cases (problem_id);
+CREATE INDEX ix_test_cases_id ON test_cases (id);
+CREATE INDEX ix_testcase_problem_hidden ON test_cases (problem_id, is_hidden);
+CREATE INDEX ix_test_cases_is_hidden ON test_cases (is_hidden);
+CREATE TABLE submissions (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    problem_id INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    score FLOAT,
+    status VARCHAR(50) NOT NULL,
+    results JSON,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(problem_id) REFERENCES problems (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_submissions_created_at ON submissions (created_at);
+CREATE INDEX ix_submissions_problem_id ON submissions (problem_id);
+CREATE INDEX ix_submissions_id ON submissions (id);
+CREATE INDEX ix_submissions_user_id ON submissions (user_id);
+CREATE INDEX ix_submission_user_problem ON submissions (user_id, problem_id, created_at);
+CREATE TABLE user_test_cases (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    problem_id INTEGER NOT NULL,
+    input TEXT NOT NULL,
+    expected_output TEXT NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(problem_id) REFERENCES problems (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_usertestcase_user_problem ON user_test_cases (user_id, problem_id);
+CREATE INDEX ix_user_test_cases_user_id ON user_test_cases (user_id);
+CREATE INDEX ix_user_test_cases_id ON user_test_cases (id);
+CREATE INDEX ix_user_test_cases_problem_id ON user_test_cases (problem_id);
+"""
+CREATED_AT = "2024-09-02 10:00:00.000000"
+TESTS = [  # (id, input, expected output, is_hidden)
+    (1, "1 2", "3", 0),
+    (2, "5 5", "10", 1),
+    (3, "1 2 3 4 5 6 7 8 9 10", "55", 1),  # above the file threshold set by the fixture
+]
+FILE_BACKED_TEST = 3
+SUBMISSIONS = 10
+RAW_ERROR_SUBMISSION = 4  # results stored as plain text by early versions
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """First-release database with a problem, its tests and SUBMISSIONS submissions; returns its path"""
+    monkeypatch.setattr(test_data_store, "threshold", 16)
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users VALUES (1, 'student', 'x', 'student', ?)", (CREATED_AT,))
+    conn.execute("INSERT INTO problems VALUES (1, 'Sum', 'Add numbers', 'easy', NULL, ?)", (CREATED_AT,))
+    conn.executemany(
+        "INSERT INTO test_cases VALUES (?, 1, ?, ?, ?, ?)",
+        [(tc_id, tc_input, expected, hidden, tc_id) for tc_id, tc_input, expected, hidden in TESTS]
+    )
+    conn.execute("INSERT INTO user_test_cases VALUES (1, 1, 1, '2 2', '4')")
+    for i in range(1, SUBMISSIONS + 1):
+        if i == RAW_ERROR_SUBMISSION:
+            results = "Compilation failed"
+        else:
+            results = json.dumps([
+                {"input": "5 5", "expected_output": "10", "actual_output": "9", "passed": False,
+                 "status": "Wrong Answer", "time": "0.01", "memory": "100", "stderr": None},
+                {"input": TESTS[2][1], "expected_output": "55", "actual_output": "55", "passed": True,
+                 "status": "Accepted", "time": "0.01", "memory": "100", "stderr": None},
+            ])
+        conn.execute(
+            "INSERT INTO submissions VALUES (?, 1, 1, ?, 50.0, 'completed', ?, ?)",
+            (i, f"int main(){{return {i % 3};}}", results, CREATED_AT)
+        )
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def baseline_conn(baseline_db):
+    conn = migrations.connect(baseline_db)
+    yield conn
+    conn.close()
+
+def assert_fully_migrated(conn):
+    assert migrations.pending_migrations(conn) == []
+    assert conn.execute("SELECT COUNT(*) FROM migration_progress").fetchone()[0] == 0
+    converted = SUBMISSIONS - 1
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT submission_id) FROM test_results").fetchone() == (2 * converted, converted)
+    assert conn.execute("SELECT COUNT(*) FROM code_blobs").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM submissions WHERE code_hash IS NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT best_score, attempts FROM best_scores").fetchall() == [(50.0, SUBMISSIONS)]
+
+def test_interrupted_migration_resumes_without_duplicates(baseline_conn, monkeypatch):
+    real = migrations.compact_results
+    calls = []
+
+    def failing_compact_results(*args):
+        calls.append(args)
+        if len(calls) == 6:  # third chunk of submission_results_table (submission 4 is no JSON list)
+            raise RuntimeError("interrupted")
+        return real(*args)
+
+    monkeypatch.setattr(migrations, "compact_results", failing_compact_results)
+    with pytest.raises(RuntimeError):
+        migrations.migrate(baseline_conn, chunk_size=2)
+    baseline_conn.rollback()
+    # The chunks committed before the failure are kept, with the cursor after them
+    assert baseline_conn.execute("SELECT last_id FROM migration_progress").fetchall() == [(5,)]
+    assert baseline_conn.execute("SELECT COUNT(DISTINCT submission_id) FROM test_results").fetchone()[0] == 4
+
+    monkeypatch.setattr(migrations, "compact_results", real)
+    assert migrations.migrate(baseline_conn, chunk_size=2) > 0
+    assert_fully_migrated(baseline_conn)
+    raw_error = baseline_conn.execute("SELECT results FROM submissions WHERE id = ?", (RAW_ERROR_SUBMISSION,)).fetchone()[0]
+    assert json.loads(raw_error) == {"error": "Compilation failed"}
+
+def test_migrated_database_is_left_alone(baseline_conn):
+    migrations.migrate(baseline_conn, chunk_size=3)
+    assert_fully_migrated(baseline_conn)
+    assert migrations.migrate(baseline_conn, chunk_size=3) == 0
+    assert_fully_migrated(baseline_conn)
+
+def test_migrated_database_matches_the_current_models(baseline_db, baseline_conn):
+    migrations.migrate(baseline_conn)
+    engine = create_engine(f"sqlite:///{baseline_db}")
+    try:
+        Base.metadata.create_all(bind=engine)  # what init_db does on startup: adds new tables only
+        inspector = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            migrated_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            assert {col.name for col in table.columns} <= migrated_columns, table.name
+
+        db = sessionmaker(bind=engine)()
+        try:
+            tests = {tc.id: tc for tc in db.query(models.TestCase)}
+            assert [(tc.input, tc.expected_output) for tc in tests.values()] == [(i, e) for _, i, e, _ in TESTS]
+            assert tests[FILE_BACKED_TEST].input_ref and not tests[1].input_ref
+            submission = db.get(models.Submission, 1)
+            assert submission.code == "int main(){return 1;}"
+            rows = db.query(models.TestResult).filter(models.TestResult.submission_id == 1).order_by(models.TestResult.position).all()
+        finally:
+            db.close()
+    finally:
+        engine.dispose()
+
+    # Inline tests keep their hash, so a regrade reuses their results; moved tests run again
+    assert [row.test_case_id for row in rows] == [2, FILE_BACKED_TEST]
+    assert rows[0].test_hash == results_store.current_test_hash(tests[2])
+    assert rows[1].test_hash != results_store.current_test_hash(tests[FILE_BACKED_TEST])
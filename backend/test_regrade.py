@@ -0,0 +1,260 @@
+"""
+Incremental regrades (regrade.py, grading.regrade_code) on a temporary SQLite file,
+with a fake executor standing in for gcc
+"""
+import asyncio
+
+import pytest
+
+import grading
+import models
+import regrade
+import snapshot_cache
+import submission_writer
+from database import SessionLocal
+from result_cache import ResultCache
+
+class FakeExecutor:
+    """Runs the "programs" ADD and SUB on the two numbers of each test's input"""
+    def __init__(self):
+        self.executed = []  # inputs of the tests run, in order
+        self.errors = set()  # inputs whose runs fail with an executor error
+        self.needs_files = False  # programs only compile with their additional files
+        self.on_execute = None  # called before each run
+
+    async def execute_code(self, source_code, test_cases, additional_files=None):
+        if self.on_execute:
+            self.on_execute()
+        if self.needs_files and not additional_files:
+            return [{
+                "input": tc["input"], "expected_output": tc["expected_output"], "actual_output": "",
+                "passed": False, "status": "Compilation Error", "compile_output": "stack.h: No such file"
+            } for tc in test_cases]
+        results = []
+        for tc in test_cases:
+            self.executed.append(tc["input"])
+            if tc["input"] in self.errors:
+                results.append({
+                    "input": tc["input"], "expected_output": tc["expected_output"], "actual_output": "",
+                    "passed": False, "status": "Error", "error": "executor unavailable"
+                })
+                continue
+            a, b = map(int, tc["input"].split())
+            actual = f"{a + b if source_code == 'ADD' else a - b}\n"
+            passed = actual.strip() == tc["expected_output"].strip()
+            results.append({
+                "input": tc["input"], "expected_output": tc["expected_output"], "actual_output": actual,
+                "passed": passed, "status": "Accepted" if passed else "Wrong Answer",
+                "stderr": None, "time": "0.01", "memory": "100"
+            })
+        return results
+
+@pytest.fixture
+def executor(seeded, monkeypatch):
+    """Fake executor behind grading, with empty result and test-set caches"""
+    fake = FakeExecutor()
+    monkeypatch.setattr(grading.judge0_client, "execute_code", fake.execute_code)
+    monkeypatch.setattr(grading, "result_cache", ResultCache())
+    monkeypatch.setattr(regrade, "test_set_cache", snapshot_cache.TestSetCache())
+    return fake
+
+def add_tests(problem_id, cases):
+    """Add hidden tests (input, expected output); returns their ids"""
+    db = SessionLocal()
+    try:
+        test_cases = []
+        for input_data, expected in cases:
+            tc = models.TestCase(problem_id=problem_id, is_hidden=True)
+            tc.input = input_data
+            tc.expected_output = expected
+            test_cases.append(tc)
+        db.add_all(test_cases)
+        snapshot_cache.bump_revision(db, db.get(models.Problem, problem_id))
+        db.commit()
+        return [tc.id for tc in test_cases]
+    finally:
+        db.close()
+
+def change_test(test_id, expected_output=None):
+    """Edit a test's expected output, or delete the test when none is given"""
+    db = SessionLocal()
+    try:
+        tc = db.get(models.TestCase, test_id)
+        snapshot_cache.bump_revision(db, tc.problem)
+        if expected_output is None:
+            db.delete(tc)
+        else:
+            tc.expected_output = expected_output
+        db.commit()
+    finally:
+        db.close()
+
+def submit(user_id, problem_id, code):
+    """Grade and store a submission the way the submit route does; returns its id"""
+    db = SessionLocal()
+    try:
+        hidden = list(regrade.test_set_cache.get_by_id(db, problem_id).hidden)
+    finally:
+        db.close()
+    status, score, results = asyncio.run(grading.grade_code(problem_id, hidden, code))
+    [row] = submission_writer.commit_submissions([
+        submission_writer.NewSubmission(user_id, problem_id, code, None, status, score, results)
+    ])
+    return row.id
+
+def run_regrade(problem_id, user_id, resume_after=None):
+    """
+    Run a regrade job of the problem to completion; returns the finished job.
+    resume_after sets the job cursor as if a run had stopped after that submission.
+    """
+    db = SessionLocal()
+    try:
+        job = regrade.regrader.create_job(db, problem_id, None, user_id)
+        if resume_after is not None:
+            job.status = "running"
+            job.last_submission_id = resume_after
+            job.processed = db.query(models.Submission).filter(
+                models.Submission.problem_id == problem_id, models.Submission.id <= resume_after
+            ).count()
+            db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+    asyncio.run(regrade.Regrader()._run(job_id))
+    return load(models.RegradeJob, job_id)
+
+def load(model, id):
+    db = SessionLocal()
+    try:
+        return db.get(model, id)
+    finally:
+        db.close()
+
+def stored_rows(submission_id):
+    db = SessionLocal()
+    try:
+        return db.query(models.TestResult).filter(
+            models.TestResult.submission_id == submission_id
+        ).order_by(models.TestResult.position).all()
+    finally:
+        db.close()
+
+def test_reused_rows_keep_their_output_digest_and_diff(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    add_tests(problem_id, [("3 0", "3"), ("5 5", "10")])
+    submission_id = submit(alice, problem_id, "SUB")
+    before = [(row.output_digest, row.diff) for row in stored_rows(submission_id)]
+    assert before[1][1]  # the failed test has a diff
+
+    add_tests(problem_id, [("2 2", "4")])
+    job = run_regrade(problem_id, alice)
+
+    assert (job.status, job.tests_executed, job.tests_reused) == ("completed", 1, 2)
+    rows = stored_rows(submission_id)
+    assert [(row.output_digest, row.diff) for row in rows[:2]] == before
+    assert rows[2].output_digest and rows[2].diff
+
+def test_interrupted_job_resumes_after_its_cursor(executor, seeded):
+    (alice, bob), (problem_id, _) = seeded
+    add_tests(problem_id, [("1 2", "3")])
+    first = submit(alice, problem_id, "SUB")
+    second = submit(bob, problem_id, "SUB")
+    add_tests(problem_id, [("3 0", "3")])
+    executor.executed.clear()
+
+    job = run_regrade(problem_id, alice, resume_after=first)
+
+    assert (job.status, job.processed, job.total, job.last_submission_id) == ("completed", 2, 2, second)
+    assert executor.executed == ["3 0"]
+    assert len(stored_rows(first)) == 1
+    assert len(stored_rows(second)) == 2
+    assert load(models.Submission, second).score == 50.0
+
+def test_executor_errors_keep_the_stored_grade(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    add_tests(problem_id, [("1 2", "3")])
+    submission_id = submit(alice, problem_id, "ADD")
+    add_tests(problem_id, [("7 1", "8")])
+    executor.errors.add("7 1")
+
+    job = run_regrade(problem_id, alice)
+
+    assert (job.status, job.failed, job.changed) == ("completed", 1, 0)
+    assert load(models.Submission, submission_id).score == 100.0
+    assert [row.status for row in stored_rows(submission_id)] == ["Accepted"]
+
+def test_submissions_without_their_files_keep_the_stored_grade(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    add_tests(problem_id, [("1 2", "3")])
+    submission_id = submit(alice, problem_id, "ADD")  # stored before additional files were kept
+    add_tests(problem_id, [("2 2", "4")])
+    executor.needs_files = True
+
+    job = run_regrade(problem_id, alice)
+
+    assert (job.status, job.failed) == ("completed", 1)
+    submission = load(models.Submission, submission_id)
+    assert (submission.status, submission.score) == ("completed", 100.0)
+
+def test_only_modified_tests_run_again(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    first, second, third = add_tests(problem_id, [("1 2", "3"), ("2 2", "4"), ("3 3", "6")])
+    submission_id = submit(alice, problem_id, "ADD")
+    change_test(second, "5")
+    executor.executed.clear()
+
+    job = run_regrade(problem_id, alice)
+
+    assert executor.executed == ["2 2"]
+    assert (job.tests_executed, job.tests_reused, job.changed) == (1, 2, 1)
+    rows = stored_rows(submission_id)
+    assert [(row.test_case_id, row.passed) for row in rows] == [(first, True), (second, False), (third, True)]
+    assert rows[1].test_hash != rows[0].test_hash
+
+def test_deleted_tests_are_dropped(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    first, second = add_tests(problem_id, [("1 2", "3"), ("2 2", "5")])
+    submission_id = submit(alice, problem_id, "ADD")
+    change_test(second)
+    executor.executed.clear()
+
+    job = run_regrade(problem_id, alice)
+
+    assert executor.executed == []
+    assert (job.tests_executed, job.tests_reused) == (0, 1)
+    assert [row.test_case_id for row in stored_rows(submission_id)] == [first]
+    assert load(models.Submission, submission_id).score == 100.0
+
+def test_stored_executor_errors_run_again(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    add_tests(problem_id, [("1 2", "3"), ("7 1", "8")])
+    executor.errors.add("7 1")
+    submission_id = submit(alice, problem_id, "ADD")
+    assert load(models.Submission, submission_id).score == 50.0
+    executor.errors.clear()
+    executor.executed.clear()
+
+    job = run_regrade(problem_id, alice)
+
+    assert executor.executed == ["7 1"]
+    assert (job.tests_executed, job.tests_reused) == (1, 1)
+    assert load(models.Submission, submission_id).score == 100.0
+    assert [row.status for row in stored_rows(submission_id)] == ["Accepted", "Accepted"]
+
+def test_problem_deleted_during_a_job_ends_it_quietly(executor, seeded):
+    (alice, _), (problem_id, _) = seeded
+    add_tests(problem_id, [("1 2", "3")])
+    submit(alice, problem_id, "ADD")
+    add_tests(problem_id, [("2 2", "4")])
+
+    def delete_problem():
+        # The way the delete route does it: the job row goes with the problem (ON DELETE CASCADE)
+        db = SessionLocal()
+        try:
+            db.query(models.Problem).filter(models.Problem.id == problem_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+    executor.on_execute = delete_problem
+
+    assert run_regrade(problem_id, alice) is None
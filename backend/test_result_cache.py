@@ -0,0 +1,18 @@
+"""
+Source normalization behind the result cache keys (result_cache.py)
+"""
+import result_cache
+
+def normalized(source):
+    return result_cache.normalize_c_source(source)
+
+def test_layout_and_comments_do_not_matter():
+    assert normalized("int main() { // entry\n  return 0; /* done */ }") == normalized("int main(){return 0;}")
+
+def test_line_splices_are_removed_before_tokenizing():
+    assert normalized("int a\\\nb = 1;") == normalized("int ab = 1;")
+    assert normalized("int a\\\nb = 1;") != normalized("int a b = 1;")
+    assert normalized("#define ONE \\\n 1\nint x = ONE;") == normalized("#define ONE 1\nint x = ONE;")
+
+def test_function_like_and_object_like_macros_differ():
+    assert normalized("#define F(x) x\nint y = F(1);") != normalized("#define F (x) x\nint y = F(1);")
@@ -0,0 +1,96 @@
+"""
+Content-addressed file store for large test inputs and expected outputs.
+Values of FILE_BACKED_THRESHOLD bytes or more are written once to
+TEST_DATA_DIR/<sha[:2]>/<sha> and referenced from TestCase by hash. The local
+executor connects the child's stdin straight to the file and compares output
+against an mmap of the expected file, so big tests are never held in Python strings.
+
+Usage: python testdata_store.py gc   # delete files no test case references
+"""
+import hashlib
+import os
+import sys
+import tempfile
+from typing import Dict, Optional, Tuple
+
+TEST_DATA_DIR = os.getenv("TEST_DATA_DIR", "./test_data")
+FILE_BACKED_THRESHOLD = int(os.getenv("FILE_BACKED_THRESHOLD", str(64 * 1024)))
+
+class TestDataStore:
+    def __init__(self, root: str = TEST_DATA_DIR, threshold: int = FILE_BACKED_THRESHOLD):
+        self.root = root
+        self.threshold = threshold
+
+    def path(self, ref: str) -> str:
+        return os.path.join(self.root, ref[:2], ref)
+
+    def put(self, text: str) -> str:
+        """Write text if it is not stored yet and return its sha256"""
+        data = text.encode()
+        ref = hashlib.sha256(data).hexdigest()
+        path = self.path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return ref
+
+    def store(self, text: str) -> Tuple[Optional[str], str]:
+        """(ref, inline text) for a value - large values go to a file and are not kept inline"""
+        if len(text) >= self.threshold:
+            return self.put(text), ""
+        return None, text
+
+    def read(self, ref: str) -> str:
+        with open(self.path(ref), "rb") as f:
+            return f.read().decode()
+
+    def read_preview(self, ref: str, limit: int) -> str:
+        with open(self.path(ref), "rb") as f:
+            data = f.read(limit + 1)
+        text = data[:limit].decode(errors="replace")
+        return text + "\n... (truncated)" if len(data) > limit else text
+
+    def collect_garbage(self, referenced: set) -> int:
+        """Delete files whose hash is not in referenced; returns the number deleted"""
+        deleted = 0
+        if not os.path.isdir(self.root):
+            return deleted
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                # Skip in-progress temp files - stored files are named by their 64-char hash
+                if len(filename) == 64 and filename not in referenced:
+                    os.remove(os.path.join(dirpath, filename))
+                    deleted += 1
+        return deleted
+
+def load_text(test_case: Dict, field: str) -> str:
+    """Full input/expected_output of an executor test case, reading file-backed data"""
+    path = test_case.get("input_path" if field == "input" else "expected_path")
+    if path:
+        with open(path, "rb") as f:
+            return f.read().decode()
+    return test_case[field]
+
+# Global store instance
+test_data_store = TestDataStore()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    import models
+
+    if sys.argv[1:] != ["gc"]:
+        print("Usage: python testdata_store.py gc")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        referenced = set()
+        for input_ref, expected_ref in db.query(models.TestCase.input_ref, models.TestCase.expected_ref):
+            referenced.update(ref for ref in (input_ref, expected_ref) if ref)
+        print(f"✓ Deleted {test_data_store.collect_garbage(referenced)} orphaned test data files")
+    finally:
+        db.close()
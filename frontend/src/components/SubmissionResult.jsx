@@ -2,14 +2,40 @@
 import './SubmissionResult.css'
 import React, { useEffect, useState } from 'react'
 import {createPortal} from 'react-dom'
+import axios from 'axios'
 
 const SubmissionResult = ({ submission, clearCurrentSubmission}) => {
+  // Stored submissions return per-test results in pages; later pages are appended here
+  const [moreResults, setMoreResults] = useState([])
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  useEffect(() => {
+    setMoreResults([])
+  }, [submission])
+
   if (!submission) return null;
   
   // Handle both JSON object (new) and JSON string (old)
-  const results = typeof submission.results === 'string'
+  const firstPage = typeof submission.results === 'string'
     ? JSON.parse(submission.results)
     : submission.results || []
+  const results = Array.isArray(firstPage) ? [...firstPage, ...moreResults] : firstPage
+  const totalResults = submission.results_total ?? results.length
+  const passedResults = submission.results_passed ?? (Array.isArray(results) ? results.filter(r => r.passed).length : 0)
+
+  const loadMoreResults = async () => {
+    setLoadingMore(true)
+    try {
+      const response = await axios.get(`/api/submissions/${submission.id}`, {
+        params: { results_offset: results.length }
+      })
+      setMoreResults((prev) => [...prev, ...(response.data.results || [])])
+    } catch (err) {
+      console.error('Failed to load more results:', err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   const hasError = submission.status === 'error' || results.error
   const isCompilationError = submission.status === 'compilation_error'
@@ -41,7 +67,7 @@ const SubmissionResult = ({ submission, clearCurrentSubmission}) => {
 
       {!hasError && Array.isArray(results) && (
         <div className="test-results">
-          <h4>Test Results ({results.filter(r => r.passed).length}/{results.length} passed)</h4>
+          <h4>Test Results ({passedResults}/{totalResults} passed)</h4>
           <div className="test-results-list">
             {results.map((result, index) => (
               <div key={index} className={`test-result-item ${result.passed ? 'passed' : 'failed'}`}>
@@ -66,16 +92,30 @@ const SubmissionResult = ({ submission, clearCurrentSubmission}) => {
                   </div>
                 )}
                 
-                {!result.passed && !result.compile_output && (
+                {result.test_changed && (
+                  <div className="test-detail">
+                    <em>Test changed since grading - its input and expected output are no longer shown</em>
+                  </div>
+                )}
+                
+                {!result.passed && !result.compile_output && !result.test_changed && (
                   <div className='test-detail-container'>
                     <div className="test-detail">
                       <strong>Expected:</strong>
                       <pre>{result.expected_output}</pre>
                     </div>
-                    <div className="test-detail">
-                      <strong>Got:</strong>
-                      <pre>{result.actual_output || '(no output)'}</pre>
-                    </div>
+                    {/* Stored submissions keep only a diff of the output, fresh results have the full output */}
+                    {result.actual_output == null && result.diff ? (
+                      <div className="test-detail">
+                        <strong>Diff:</strong>
+                        <pre>{result.diff}</pre>
+                      </div>
+                    ) : (
+                      <div className="test-detail">
+                        <strong>Got:</strong>
+                        <pre>{result.actual_output || '(no output)'}</pre>
+                      </div>
+                    )}
                   </div>
                 )}
                 
@@ -87,6 +127,11 @@ const SubmissionResult = ({ submission, clearCurrentSubmission}) => {
               </div>
             ))}
           </div>
+          {results.length < totalResults && (
+            <button onClick={loadMoreResults} className="btn btn-secondary btn-sm" disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : `Show more tests (${totalResults - results.length} remaining)`}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -18,6 +18,10 @@ const AdminDashboard = () => {
     description: '',
     difficulty: 'easy',
     constraints: '',
+    checker: 'exact',
+    checker_abs_eps: '',
+    checker_rel_eps: '',
+    checker_code: '',
   })
 
   useEffect(() => {
@@ -39,18 +43,27 @@ const AdminDashboard = () => {
   const handleCreateProblem = async (e) => {
     e.preventDefault()
     try {
-      await axios.post('/api/admin/problems', problemForm)
+      await axios.post('/api/admin/problems', {
+        ...problemForm,
+        checker_abs_eps: problemForm.checker_abs_eps === '' ? null : Number(problemForm.checker_abs_eps),
+        checker_rel_eps: problemForm.checker_rel_eps === '' ? null : Number(problemForm.checker_rel_eps),
+        checker_code: problemForm.checker === 'custom' ? problemForm.checker_code : null,
+      })
       setProblemForm({
         title: '',
         description: '',
         difficulty: 'easy',
         constraints: '',
+        checker: 'exact',
+        checker_abs_eps: '',
+        checker_rel_eps: '',
+        checker_code: '',
       })
       setShowProblemForm(false)
       fetchProblems()
     } catch (err) {
       console.error('Failed to create problem:', err)
-      alert('Failed to create problem')
+      alert(err.response?.data?.detail || 'Failed to create problem')
     }
   }
 
@@ -193,6 +206,67 @@ const AdminDashboard = () => {
                 />
               </div>
 
+              <div className="form-group">
+                <label className="form-label">Output Checker</label>
+                <select
+                  value={problemForm.checker}
+                  onChange={(e) =>
+                    setProblemForm({ ...problemForm, checker: e.target.value })
+                  }
+                  className="form-select"
+                >
+                  <option value="exact">Exact (ignores trailing whitespace)</option>
+                  <option value="token">Token-wise</option>
+                  <option value="float">Numeric with tolerance</option>
+                  <option value="custom">Custom checker program</option>
+                </select>
+              </div>
+
+              {problemForm.checker === 'float' && (
+                <div className="form-group">
+                  <label className="form-label">Absolute / Relative Tolerance</label>
+                  <input
+                    type="number"
+                    step="any"
+                    min="0"
+                    placeholder="e.g. 0.005"
+                    value={problemForm.checker_abs_eps}
+                    onChange={(e) =>
+                      setProblemForm({ ...problemForm, checker_abs_eps: e.target.value })
+                    }
+                    className="form-input"
+                  />
+                  <input
+                    type="number"
+                    step="any"
+                    min="0"
+                    placeholder="e.g. 1e-6"
+                    value={problemForm.checker_rel_eps}
+                    onChange={(e) =>
+                      setProblemForm({ ...problemForm, checker_rel_eps: e.target.value })
+                    }
+                    className="form-input"
+                  />
+                </div>
+              )}
+
+              {problemForm.checker === 'custom' && (
+                <div className="form-group">
+                  <label className="form-label">
+                    Checker (C, run as checker &lt;input&gt; &lt;expected&gt; &lt;actual&gt;, exit 0 = accepted)
+                  </label>
+                  <textarea
+                    value={problemForm.checker_code}
+                    onChange={(e) =>
+                      setProblemForm({ ...problemForm, checker_code: e.target.value })
+                    }
+                    className="form-textarea"
+                    rows="8"
+                    required
+                  />
+                </div>
+              )}
+
               <button type="submit" className="btn btn-success">
                 Create Problem
               </button>
@@ -215,7 +289,7 @@ const AdminDashboard = () => {
                   </span>
                 </div>
                 <div className="problem-list-item-footer">
-                  <span>{problem.test_cases?.length || 0} test cases</span>
+                  <span>{problem.test_case_count} test cases</span>
                   <button
                     onClick={(e) => {
                       e.stopPropagation()
@@ -66,11 +66,11 @@ const ProblemList = () => {
                   </span>
                 </div>
                 <p className="problem-description-preview">
-                  {problem.description.substring(0, 150)}...
+                  {problem.description_preview}...
                 </p>
                 <div className="problem-card-footer">
                   <span className="test-case-count">
-                    {problem.visible_test_cases?.length || 0} visible test cases
+                    {problem.visible_test_count} visible test cases
                   </span>
                 </div>
               </div>
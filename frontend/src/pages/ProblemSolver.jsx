@@ -19,6 +19,7 @@ const ProblemSolver = () => {
   const [currentSubmission, setCurrentSubmission] = useState(null)
   const [loading, setLoading] = useState(true)
   const [submitting, setSubmitting] = useState(false)
+  const [running, setRunning] = useState(false)
   const [error, setError] = useState('')
   const [showAddTestCase, setShowAddTestCase] = useState(false)
   const [autoSaveStatus, setAutoSaveStatus] = useState('')
@@ -74,13 +75,25 @@ const ProblemSolver = () => {
 
   const fetchSubmissions = async () => {
     try {
-      const response = await axios.get(`/api/problems/${id}/submissions`)
-      setSubmissions(response.data)
+      // Summaries only - code and per-test results are loaded when a submission is opened
+      const response = await axios.get(`/api/problems/${id}/submissions`, { params: { limit: 5 } })
+      setSubmissions(response.data.items)
     } catch (err) {
       console.error('Failed to fetch submissions:', err)
     }
   }
 
+  const viewSubmission = async (submissionId) => {
+    try {
+      const response = await axios.get(`/api/submissions/${submissionId}`)
+      setCurrentSubmission(response.data)
+    } catch (err) {
+      setError('Failed to load submission')
+      console.error(err)
+      setTimeout(() => setError(''), 5000)
+    }
+  }
+
   const handleAddUserTestCase = async (testCase) => {
     try {
       await axios.post('/api/user-testcases', {
@@ -133,7 +146,9 @@ const ProblemSolver = () => {
         code: code,
       })
       setCurrentSubmission(response.data)
-      fetchSubmissions()
+      // The response already has everything the history shows - no need to refetch it
+      const { id: subId, score, status, created_at } = response.data
+      setSubmissions((prev) => [{ id: subId, score, status, created_at }, ...prev].slice(0, 5))
 
       // Show success message
       if (response.data.status === 'compilation_error') {
@@ -152,6 +167,37 @@ const ProblemSolver = () => {
     }
   }
 
+  const handleRun = async () => {
+    if (!code.trim()) {
+      setError('Please write some code before running')
+      setTimeout(() => setError(''), 5000)
+      return
+    }
+
+    setRunning(true)
+    setError('')
+
+    try {
+      // Runs visible + custom test cases only; nothing is saved as a submission
+      const response = await axios.post('/api/run', {
+        problem_id: parseInt(id),
+        code: code,
+      })
+      setCurrentSubmission(response.data)
+      if (response.data.status === 'compilation_error') {
+        setError('Compilation error - see results below')
+        setTimeout(() => setError(''), 5000)
+      }
+    } catch (err) {
+      const errorMsg = err.response?.data?.detail || 'Run failed. Please try again.'
+      setError(errorMsg)
+      console.error(err)
+      setTimeout(() => setError(''), 8000)
+    } finally {
+      setRunning(false)
+    }
+  }
+
   const clearCurrentSubmission = () =>{ 
     setCurrentSubmission(null)};
 
@@ -239,7 +285,7 @@ const ProblemSolver = () => {
               <div className="submission-history">
                 <h3>Your Submissions</h3>
                 <div className="submission-list">
-                  {submissions.slice(0, 5).map((sub) => (
+                  {submissions.map((sub) => (
                     <div key={sub.id} className="submission-item">
                       <span className="submission-date">
                         {new Date(sub.created_at).toLocaleString()}
@@ -248,7 +294,7 @@ const ProblemSolver = () => {
                         {sub.score.toFixed(1)}%
                       </span>
                       <button
-                        onClick={() => setCurrentSubmission(sub)}
+                        onClick={() => viewSubmission(sub.id)}
                         className="btn btn-secondary btn-sm"
                       >
                         View Results
@@ -277,13 +323,20 @@ const ProblemSolver = () => {
               <button
                 onClick={handleClearCode}
                 className="btn btn-secondary"
-                disabled={submitting}
+                disabled={submitting || running}
               >
                 Clear Code
               </button>
+              <button
+                onClick={handleRun}
+                disabled={submitting || running}
+                className="btn btn-primary"
+              >
+                {running ? 'Running...' : 'Run Code'}
+              </button>
               <button
                 onClick={handleSubmit}
-                disabled={submitting}
+                disabled={submitting || running}
                 className="btn btn-success"
               >
                 {submitting ? 'Submitting...' : 'Submit Code'}